@@ -0,0 +1,80 @@
+"""
+Benchmark the medRxiv search page extraction backends on search pages captured from https://www.medrxiv.org/search/.
+
+Every available backend (see medrxiv_web_search.HTML_BACKENDS) must extract exactly the same Title/Authors/DOI_link/
+Link fields as the original html.parser backend before it is timed. benchmarks/fixtures/ ships a medRxiv result list
+trimmed to its li.search-result markup. Capture live pages next to it, or pass saved pages as arguments. Run from the
+repository root:
+
+    python benchmarks/medrxiv_html_benchmark.py --capture "heart failure" --num-results 75
+    python benchmarks/medrxiv_html_benchmark.py [page.html ...]
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mcp-servers"))
+
+from medrxiv_web_search import (  # noqa: E402
+    HEADERS, HTML_BACKENDS, _parse_search_results, generate_medrxiv_search_url, requests
+)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+REPEATS = 20
+
+
+def capture(term, num_results):
+    """Save a live medRxiv search results page as a fixture, returning its path"""
+    response = requests.get(generate_medrxiv_search_url(term=term, num_results=num_results), headers=HEADERS,
+                            timeout=30)
+    response.raise_for_status()
+
+    slug = re.sub(r"[^a-z0-9]+", "_", term.lower()).strip("_")
+    path = os.path.join(FIXTURE_DIR, f"medrxiv_search_{slug}_{num_results}.html")
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(response.text)
+
+    print(f"Saved {path} ({len(_parse_search_results(response.text, 'html.parser'))} results)")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark medRxiv search page extraction backends.")
+    parser.add_argument("pages", nargs="*", help="Saved search pages, defaults to benchmarks/fixtures/*.html")
+    parser.add_argument("--capture", metavar="TERM", help="Capture a live search page for TERM first")
+    parser.add_argument("--num-results", type=int, default=75)
+    args = parser.parse_args()
+
+    if args.capture:
+        capture(args.capture, args.num_results)
+
+    paths = args.pages or sorted(glob.glob(os.path.join(FIXTURE_DIR, "medrxiv_search_*.html")))
+    if not paths:
+        sys.exit("No search pages to benchmark, capture one with --capture TERM")
+
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            html = file.read()
+
+        baseline = _parse_search_results(html, "html.parser")
+        print(f"\n{os.path.basename(path)}: {len(html) / 1024:.0f}KB, {len(baseline)} results")
+        print(f"{'backend':>12} {'ms':>8} {'speedup':>8}  parity")
+
+        baseline_time = None
+        for backend in HTML_BACKENDS:
+            parity = _parse_search_results(html, backend) == baseline
+            elapsed = min(timeit.repeat(lambda: _parse_search_results(html, backend), number=1, repeat=REPEATS))
+            baseline_time = baseline_time or elapsed
+
+            speedup = baseline_time / elapsed
+            print(f"{backend:>12} {elapsed * 1000:>8.2f} {speedup:>7.2f}x  {'ok' if parity else 'MISMATCH'}")
+            if not parity:
+                sys.exit(f"{backend} does not match html.parser on {path}")
+
+
+if __name__ == "__main__":
+    main()
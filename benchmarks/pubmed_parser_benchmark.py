@@ -0,0 +1,167 @@
+"""
+Benchmark the streaming PubMed efetch parser against the original ElementTree parser.
+
+Generates synthetic efetch payloads shaped like real responses (authors, structured abstracts, reference lists) with
+10, 100 and 1000 articles, checks both parsers return identical articles, and reports best-of timings and peak
+memory. Run from the repository root:
+
+    python benchmarks/pubmed_parser_benchmark.py
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+from typing import List
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mcp-servers"))
+
+from pubmed_server import PubMedArticle, _parse_pubmed_xml, logger  # noqa: E402
+
+SIZES = [10, 100, 1000]
+REPEATS = 5
+
+
+# Original full-tree parser with descendant searches, kept verbatim as the baseline
+def legacy_parse_pubmed_xml(xml_data: str) -> List[PubMedArticle]:
+    """Parse PubMed XML response"""
+    articles = []
+    try:
+        root = ET.fromstring(xml_data)
+
+        for article_elem in root.findall(".//PubmedArticle"):
+            try:
+                # Extract PMID
+                pmid_elem = article_elem.find(".//PMID")
+                pmid = pmid_elem.text if pmid_elem is not None else ""
+
+                # Extract title
+                title_elem = article_elem.find(".//ArticleTitle")
+                title = title_elem.text if title_elem is not None else "No title available"
+
+                # Extract authors
+                authors = []
+                author_list = article_elem.find(".//AuthorList")
+                if author_list is not None:
+                    for author in author_list.findall(".//Author"):
+                        last_name = author.find("LastName")
+                        first_name = author.find("ForeName")
+                        if last_name is not None:
+                            name = last_name.text
+                            if first_name is not None:
+                                name += f", {first_name.text}"
+                            authors.append(name)
+
+                # Extract abstract
+                abstract_elem = article_elem.find(".//Abstract/AbstractText")
+                abstract = abstract_elem.text if abstract_elem is not None else "No abstract available"
+
+                # Extract DOI
+                doi = None
+                for article_id in article_elem.findall(".//ArticleId"):
+                    if article_id.get("IdType") == "doi":
+                        doi = article_id.text
+                        break
+
+                # Extract publication date
+                pub_date = None
+                pub_date_elem = article_elem.find(".//PubDate")
+                if pub_date_elem is not None:
+                    year = pub_date_elem.find("Year")
+                    month = pub_date_elem.find("Month")
+                    if year is not None:
+                        pub_date = year.text
+                        if month is not None:
+                            pub_date += f"-{month.text}"
+
+                # Extract journal
+                journal_elem = article_elem.find(".//Journal/Title")
+                journal = journal_elem.text if journal_elem is not None else None
+
+                article = PubMedArticle(
+                    pmid=pmid,
+                    title=title,
+                    authors=authors,
+                    abstract=abstract,
+                    doi=doi,
+                    publication_date=pub_date,
+                    journal=journal,
+                    url=f"https://pubmed.ncbi.nlm.nih.gov/{pmid}"
+                )
+                articles.append(article)
+
+            except Exception as e:
+                logger.warning(f"Failed to parse article: {e}")
+                continue
+
+    except ET.ParseError as e:
+        logger.error(f"XML parsing error: {e}")
+
+    return articles
+
+
+def make_article(i: int) -> str:
+    authors = "".join(
+        f"<Author ValidYN=\"Y\"><LastName>Author{i}_{a}</LastName><ForeName>Name{a}</ForeName>"
+        f"<Initials>N</Initials><AffiliationInfo><Affiliation>Department {a}, University {i}</Affiliation>"
+        f"</AffiliationInfo></Author>"
+        for a in range(8)
+    )
+    references = "".join(
+        f"<Reference><Citation>Reference {r} of article {i}.</Citation><ArticleIdList>"
+        f"<ArticleId IdType=\"pubmed\">{90000000 + r}</ArticleId><ArticleId IdType=\"doi\">10.1000/ref.{i}.{r}"
+        f"</ArticleId></ArticleIdList></Reference>"
+        for r in range(25)
+    )
+    return (
+        f"<PubmedArticle><MedlineCitation Status=\"MEDLINE\" Owner=\"NLM\"><PMID Version=\"1\">{30000000 + i}</PMID>"
+        f"<Article PubModel=\"Print\"><Journal><ISSN IssnType=\"Print\">0000-0000</ISSN>"
+        f"<JournalIssue CitedMedium=\"Print\"><Volume>{i % 50}</Volume><Issue>{i % 12}</Issue>"
+        f"<PubDate><Year>{2000 + i % 25}</Year><Month>Jan</Month></PubDate></JournalIssue>"
+        f"<Title>Journal of Synthetic Medicine {i % 7}</Title></Journal>"
+        f"<ArticleTitle>Synthetic study number {i} of cardiac outcomes.</ArticleTitle>"
+        f"<Abstract><AbstractText Label=\"BACKGROUND\">Background for article {i}. {'Lorem ipsum. ' * 20}"
+        f"</AbstractText><AbstractText Label=\"RESULTS\">{'Results text. ' * 20}</AbstractText></Abstract>"
+        f"<AuthorList CompleteYN=\"Y\">{authors}</AuthorList></Article></MedlineCitation>"
+        f"<PubmedData><ArticleIdList><ArticleId IdType=\"pubmed\">{30000000 + i}</ArticleId>"
+        f"<ArticleId IdType=\"doi\">10.1000/synthetic.{i}</ArticleId></ArticleIdList>"
+        f"<ReferenceList>{references}</ReferenceList></PubmedData></PubmedArticle>"
+    )
+
+
+def make_payload(count: int) -> str:
+    body = "".join(make_article(i) for i in range(count))
+    return f"<?xml version=\"1.0\" ?><PubmedArticleSet>{body}</PubmedArticleSet>"
+
+
+def peak_memory(func, payload: str) -> int:
+    tracemalloc.start()
+    func(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    print(f"{'articles':>8} {'payload':>10} {'legacy ms':>10} {'stream ms':>10} {'speedup':>8} "
+          f"{'legacy peak':>12} {'stream peak':>12}")
+
+    for size in SIZES:
+        payload = make_payload(size)
+
+        # Parity check before timing
+        legacy = [article.model_dump() for article in legacy_parse_pubmed_xml(payload)]
+        streamed = [article.model_dump() for article in _parse_pubmed_xml(payload)]
+        assert legacy == streamed, f"Parsers disagree on the {size}-article payload"
+
+        legacy_time = min(timeit.repeat(lambda: legacy_parse_pubmed_xml(payload), number=1, repeat=REPEATS))
+        stream_time = min(timeit.repeat(lambda: _parse_pubmed_xml(payload), number=1, repeat=REPEATS))
+
+        print(f"{size:>8} {len(payload) / 1024:>8.0f}KB {legacy_time * 1000:>10.2f} {stream_time * 1000:>10.2f} "
+              f"{legacy_time / stream_time:>7.2f}x "
+              f"{peak_memory(legacy_parse_pubmed_xml, payload) / 1024:>10.0f}KB "
+              f"{peak_memory(_parse_pubmed_xml, payload) / 1024:>10.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Check and time the speech-to-text client (src/transcription.py) against the local stand-in server.
+
+The stub server runs in-process on a free port. Before anything is timed, the client must:
+    - send a clip once and serve every repeat from the cache keyed by the SHA-256 of the audio,
+    - reuse one keep-alive connection for different clips,
+    - give up after its timeout, returning an empty transcript that is not cached,
+    - share one upload between concurrent async requests and between repeated submit() calls.
+Run from the repository root:
+
+    python benchmarks/transcription_benchmark.py [--delay 0.2]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from transcription import TranscriptionClient  # noqa: E402
+from transcription_stub_server import TranscriptionStubHandler  # noqa: E402
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TranscriptionStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/generate"
+
+
+def check(condition, message):
+    if not condition:
+        sys.exit(f"FAILED: {message}")
+    print(f"ok  {message}")
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the transcription client against the stub server.")
+    parser.add_argument("--delay", type=float, default=0.2, help="Seconds the stub takes per transcription")
+    args = parser.parse_args()
+
+    server, url = start_stub()
+    stub = TranscriptionStubHandler
+    stub.delay = args.delay
+    clip, other_clip = os.urandom(64 * 1024), os.urandom(64 * 1024)
+
+    client = TranscriptionClient(url)
+    try:
+        transcript, cold_ms = timed(client.transcribe, clip)
+        check(stub.transcript in transcript, "transcribes a clip")
+
+        repeat, cached_ms = timed(client.transcribe, bytes(clip))
+        check(repeat == transcript and stub.requests == 1, "repeat of the same audio is served from the cache")
+
+        client.transcribe(other_clip)
+        check(stub.requests == 2 and stub.connections == 1, "different clips reuse one keep-alive connection")
+
+        before = stub.requests
+        submitted_clip = os.urandom(64 * 1024)
+        futures = [client.submit(submitted_clip) for _ in range(3)]
+        futures[0].result()
+        check(all(future is futures[0] for future in futures) and stub.requests == before + 1,
+              "repeated submit() calls share one upload")
+        check(client.submit(clip).result() == transcript, "submit() is served from the cache")
+
+        async def concurrent():
+            audio = os.urandom(64 * 1024)
+            results = await asyncio.gather(*(client.atranscribe(audio) for _ in range(5)))
+            await client.aclose()
+            return results
+
+        before = stub.requests
+        results = asyncio.run(concurrent())
+        check(len(set(results)) == 1 and stub.requests == before + 1, "concurrent async requests share one upload")
+    finally:
+        client.close()
+
+    stub.delay = 1.0
+    slow_client = TranscriptionClient(url, timeout=0.2)
+    try:
+        transcript, timeout_ms = timed(slow_client.transcribe, clip)
+        check(transcript == "" and slow_client.errors == 1, f"gives up after its timeout ({timeout_ms:.0f} ms)")
+        check(slow_client.stats()["size"] == 0, "timed out requests are not cached")
+    finally:
+        slow_client.close()
+        server.shutdown()
+
+    print(f"\n{'request':>10} {'ms':>8}")
+    print(f"{'cold':>10} {cold_ms:>8.2f}")
+    print(f"{'cached':>10} {cached_ms:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import asyncio
+import importlib.util
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]"); fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Status codes worth retrying, everything else in 4xx/5xx is returned to the caller as a failure
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class RetryBudget:
+    """
+    Process-wide retry budget shared by every request made through a PooledHTTPClient.
+
+    Each first attempt deposits `ratio` tokens and each retry withdraws one, so retries can never exceed roughly
+    `ratio` of the recent request volume plus a small `min_per_second` floor. This keeps a struggling upstream from
+    being hit with a retry storm when every in-flight request fails at once.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._last_refill = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last_refill) * self.min_per_second)
+        self._last_refill = now
+
+    def deposit(self):
+        self._refill()
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        self._refill()
+        if self._tokens < 1.0:
+            return False
+
+        self._tokens -= 1.0
+        return True
+
+
+class RateLimiter:
+    """Async limiter that spaces request starts at most `rate` per second, shared by every coroutine that uses it."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class PooledHTTPClient:
+    """
+    Lazily created, process-wide httpx.AsyncClient with keep-alive pooling and jittered exponential backoff.
+
+    The underlying client is built on first use so it binds to the event loop of the running MCP server rather than
+    whatever loop (if any) exists at import time.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        max_attempts: int = 5,
+        backoff_base: float = 0.25,
+        backoff_cap: float = 8.0,
+        retry_budget: Optional[RetryBudget] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_budget = retry_budget if retry_budget is not None else RetryBudget()
+        self.headers = headers or {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Counters exposed through stats()
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.retries_denied = 0
+        self.failures = 0
+        self.connections_opened = 0
+
+        if http2 and not HTTP2_AVAILABLE:
+            logger.info("h2 is not installed, pooled HTTP client will use HTTP/1.1 keep-alive.")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                headers=self.headers,
+                follow_redirects=True,
+            )
+        return self._client
+
+    # httpcore trace hook, fires once per new TCP connection so reuse can be derived from attempts
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying transient failures. Raises the last error once retries are exhausted."""
+        self.requests += 1
+        self.retry_budget.deposit()
+        extensions = {**kwargs.pop("extensions", {}), "trace": self._trace}
+
+        attempt = 0
+        while True:
+            self.attempts += 1
+            try:
+                logger.debug(f"HTTP {method} attempt {attempt + 1} to {url}")
+                response = await self.client.request(method, url, extensions=extensions, **kwargs)
+                response.raise_for_status()
+                return response
+
+            except (httpx.HTTPStatusError, httpx.TimeoutException, httpx.TransportError) as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code in RETRYABLE_STATUS_CODES
+                attempt += 1
+
+                if not retryable or attempt >= self.max_attempts:
+                    self.failures += 1
+                    raise
+
+                if not self.retry_budget.try_withdraw():
+                    logger.warning(f"Retry budget exhausted, not retrying {url}: {type(e).__name__}: {e}")
+                    self.retries_denied += 1
+                    self.failures += 1
+                    raise
+
+                sleep_time = self._backoff(attempt)
+                logger.warning(f"HTTP request attempt {attempt} failed: {type(e).__name__}: {e}. "
+                               f"Retrying in {sleep_time:.2f} seconds...")
+                self.retries += 1
+                await asyncio.sleep(sleep_time)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        reused = max(self.attempts - self.connections_opened, 0)
+        return {
+            "http2": self.http2,
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "connections_opened": self.connections_opened,
+            "connections_reused": reused,
+            "pool_reuse_rate": reused / self.attempts if self.attempts else 0.0,
+            "retries": self.retries,
+            "retries_denied": self.retries_denied,
+            "retry_rate": self.retries / self.requests if self.requests else 0.0,
+            "failures": self.failures,
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
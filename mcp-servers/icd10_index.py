@@ -0,0 +1,242 @@
+import bisect
+import csv
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# On-disk layout: header, four uint32 arrays (record offsets, token offsets, posting offsets, postings), then the
+# UTF-8 record blob ("code\tname" per record) and the UTF-8 token blob. Every section is 4-byte aligned so the
+# arrays can be viewed straight out of the memory map without copying.
+MAGIC = b'ICD10IX1' + (b'L' if sys.byteorder == 'little' else b'B') + b'\0\0\0'
+HEADER = struct.Struct('=12sIIIII')
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:\.[a-z0-9]+)?')
+
+
+def _format_code(code: str) -> str:
+    """CMS files store codes without the dot (E119), NIH returns them dotted (E11.9)."""
+    code = code.strip().upper()
+    if '.' not in code and len(code) > 3:
+        code = f'{code[:3]}.{code[3:]}'
+    return code
+
+
+def _tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _record_tokens(code: str, name: str) -> set:
+    # Codes are searchable both dotted and undotted, names word by word
+    tokens = set(_tokenize(name))
+    tokens.add(code.lower())
+    tokens.add(code.lower().replace('.', ''))
+    return tokens
+
+
+def read_table(path: str) -> List[Tuple[str, str]]:
+    """
+    Read an ICD-10-CM code table. Supported formats:
+        - CSV/TSV with code and name columns (an optional header row is skipped)
+        - CMS icd10cm_codes_YYYY.txt: code, whitespace, description
+        - CMS icd10cm_order_YYYY.txt: fixed width, only billable (header flag 1) codes are kept
+    """
+    rows = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        if path.endswith(('.csv', '.tsv')) or '\t' in file.readline():
+            file.seek(0)
+            delimiter = '\t' if not path.endswith('.csv') else ','
+            for row in csv.reader(file, delimiter=delimiter):
+                if len(row) < 2 or row[0].strip().lower() == 'code':
+                    continue
+                rows.append((_format_code(row[0]), row[1].strip()))
+            return rows
+
+        file.seek(0)
+        for line in file:
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+
+            # Order file: "00001 A00     0 Cholera ..." with the long description from column 77
+            if line[:5].isdigit() and len(line) > 77:
+                if line[14] != '1':
+                    continue
+                rows.append((_format_code(line[6:13]), line[77:].strip()))
+                continue
+
+            code, _, name = line.partition(' ')
+            rows.append((_format_code(code), name.strip()))
+
+    return rows
+
+
+def build_index(rows: Iterable[Tuple[str, str]]) -> bytes:
+    """Compile (code, name) rows into the binary index layout, ordered by code."""
+    records = sorted(set(rows))
+
+    record_offsets = array('I', [0])
+    record_blob = bytearray()
+    postings_by_token = {}
+    for record_id, (code, name) in enumerate(records):
+        record_blob += f'{code}\t{name}'.encode('utf-8')
+        record_offsets.append(len(record_blob))
+
+        for token in _record_tokens(code, name):
+            postings_by_token.setdefault(token, []).append(record_id)
+
+    tokens = sorted(postings_by_token)
+    token_offsets = array('I', [0])
+    token_blob = bytearray()
+    posting_offsets = array('I', [0])
+    postings = array('I')
+    for token in tokens:
+        token_blob += token.encode('utf-8')
+        token_offsets.append(len(token_blob))
+        postings.extend(postings_by_token[token])
+        posting_offsets.append(len(postings))
+
+    # Pad the record blob so the token blob (and file end) stays aligned
+    record_blob += b'\0' * (-len(record_blob) % 4)
+
+    header = HEADER.pack(MAGIC, len(records), len(tokens), len(postings), len(record_blob), len(token_blob))
+    return b''.join([
+        header,
+        record_offsets.tobytes(), token_offsets.tobytes(), posting_offsets.tobytes(), postings.tobytes(),
+        bytes(record_blob), bytes(token_blob),
+    ])
+
+
+class _TokenView:
+    """Sequence of decoded tokens over the token blob, so bisect can search the map without materializing it."""
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode('utf-8')
+
+
+class ICD10Index:
+    """Prefix/token inverted index over ICD-10-CM codes, backed by either an in-memory buffer or a memory map."""
+
+    def __init__(self, buffer, mapped: Optional[mmap.mmap] = None):
+        self._mmap = mapped
+        view = memoryview(buffer)
+
+        magic, n_records, n_tokens, n_postings, record_blob_len, token_blob_len = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError('Not an ICD-10 index file, or it was built on a machine with a different byte order.')
+
+        position = HEADER.size
+        sections = []
+        for count in (n_records + 1, n_tokens + 1, n_tokens + 1, n_postings):
+            sections.append(view[position:position + count * 4].cast('I'))
+            position += count * 4
+
+        self._record_offsets, token_offsets, self._posting_offsets, self._postings = sections
+        self._records = view[position:position + record_blob_len]
+        position += record_blob_len
+        self._tokens = _TokenView(token_offsets, view[position:position + token_blob_len])
+
+    def __len__(self):
+        return len(self._record_offsets) - 1
+
+    @classmethod
+    def from_table(cls, path: str) -> 'ICD10Index':
+        return cls(build_index(read_table(path)))
+
+    @classmethod
+    def load(cls, path: str) -> 'ICD10Index':
+        with open(path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped)
+
+    def record(self, record_id: int) -> List[str]:
+        raw = bytes(self._records[self._record_offsets[record_id]:self._record_offsets[record_id + 1]])
+        code, _, name = raw.decode('utf-8').partition('\t')
+        return [code, name]
+
+    def _prefix_postings(self, prefix: str) -> set:
+        start = bisect.bisect_left(self._tokens, prefix)
+        end = bisect.bisect_left(self._tokens, prefix + '\uffff', lo=start)
+        if start == end:
+            return set()
+
+        return set(self._postings[self._posting_offsets[start]:self._posting_offsets[end]])
+
+    def search(self, terms: str, max_list: int = 7) -> List[List[str]]:
+        """Return [code, name] pairs whose code or name prefix-matches every query term, like the NIH API."""
+        query_tokens = _tokenize(terms)
+        if not query_tokens:
+            return []
+
+        # Intersect rarest-first so the working set shrinks as fast as possible
+        matches = None
+        for postings in sorted((self._prefix_postings(token) for token in set(query_tokens)), key=len):
+            matches = postings if matches is None else matches & postings
+            if not matches:
+                return []
+
+        return [self.record(record_id) for record_id in sorted(matches)[:max_list]]
+
+
+def open_index(table_path: Optional[str], index_path: Optional[str] = None) -> Optional[ICD10Index]:
+    """
+    Open the compiled index at index_path, (re)building it from table_path when it is missing or stale.
+    Returns None when neither file is available so callers fall back to the NIH API.
+    """
+    if index_path is None and table_path:
+        index_path = f'{table_path}.idx'
+
+    if index_path is None:
+        return None
+
+    table_exists = bool(table_path) and os.path.exists(table_path)
+    index_fresh = os.path.exists(index_path) and (
+        not table_exists or os.path.getmtime(index_path) >= os.path.getmtime(table_path)
+    )
+
+    try:
+        if not index_fresh:
+            if not table_exists:
+                logger.warning(f'No ICD-10 table found at {table_path}, local lookups are disabled.')
+                return None
+
+            logger.info(f'Building ICD-10 index from {table_path}...')
+            with open(index_path, 'wb') as file:
+                file.write(build_index(read_table(table_path)))
+
+        index = ICD10Index.load(index_path)
+        logger.info(f'Loaded local ICD-10 index with {len(index)} codes from {index_path}.')
+        return index
+
+    except (OSError, ValueError) as e:
+        logger.error(f'Unable to open local ICD-10 index: {e}')
+        return None
+
+
+if __name__ == '__main__':
+    # Precompile an index: python icd10_index.py icd10cm_order_2025.txt [icd10cm_order_2025.txt.idx]
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 2:
+        sys.exit('Usage: python icd10_index.py <table_path> [index_path]')
+
+    table_path = sys.argv[1]
+    index_path = sys.argv[2] if len(sys.argv) > 2 else f'{table_path}.idx'
+
+    # Force a rebuild
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    open_index(table_path, index_path)
@@ -1,7 +1,12 @@
-import asyncio
 import logging
+import os
 from fastmcp import FastMCP
 import httpx
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from http_client import PooledHTTPClient, RetryBudget
+from icd10_index import open_index
+from ttl_cache import TTLCache, SingleFlight, cached_call, normalize_query
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -10,60 +15,82 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 app = FastMCP("icd10")
 started: bool = False
 
+NIH_URL = 'https://clinicaltables.nlm.nih.gov/api/icd10cm/v3/search'
+
+# Optional local ICD-10-CM engine, enabled by pointing ICD10_LOCAL_TABLE at a CMS code table (or CSV/TSV of code,name)
+# and/or ICD10_LOCAL_INDEX at a compiled index. Queries are answered locally and only go to NIH on a miss.
+local_index = open_index(os.getenv('ICD10_LOCAL_TABLE'), os.getenv('ICD10_LOCAL_INDEX'))
+
+
+# Shared NIH client, pooled across every tool call so lookups reuse warm keep-alive connections
+nih_client = PooledHTTPClient(
+    timeout=float(os.getenv('ICD10_HTTP_TIMEOUT', 30.0)),
+    max_connections=int(os.getenv('ICD10_MAX_CONNECTIONS', 20)),
+    max_keepalive_connections=int(os.getenv('ICD10_MAX_KEEPALIVE_CONNECTIONS', 10)),
+    max_attempts=int(os.getenv('ICD10_MAX_ATTEMPTS', 5)),
+    retry_budget=RetryBudget(ratio=float(os.getenv('ICD10_RETRY_BUDGET_RATIO', 0.2))),
+)
+
+# Normalized-query response cache in front of _make_request, plus in-flight request coalescing
+nih_cache = TTLCache(
+    max_size=int(os.getenv('ICD10_CACHE_SIZE', 2048)),
+    ttl=float(os.getenv('ICD10_CACHE_TTL', 24 * 3600)),
+)
+nih_flight = SingleFlight()
+
 
 # HTTP request template used for all tools
-async def _make_request(url: str):
+async def _make_request(url: str, params: dict | None = None):
     try:
-        # Send request with query information
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            logging.info(f"HTTP GET attempt to {url}")
+        logging.info(f"HTTP GET to {url} with {params}")
+        return await nih_client.get(url, params=params)
+
+    except (httpx.HTTPStatusError, httpx.TransportError) as e:
+        # Retries are exhausted or the error was not retryable
+        logging.warning(f"HTTP request to NIH failed: {type(e).__name__}: {e}")
+        return False
+
+    except Exception as e:
+        # Abort if an unusual error is caught
+        logging.error(f"Unexpected error in HTTP request from NIH: {e}")
+        return False
 
-            response = await client.get(url)
-            response.raise_for_status()
 
-            # Exit if there are no errors
-            return response
+# Search the local index, returning None on a miss (or when it is disabled) so the caller can fall back to NIH
+def _local_lookup(query: str, max_list: int) -> list | None:
+    if local_index is None:
+        return None
 
-    except httpx.HTTPStatusError:
-        # Exit if sent a redirect error (standard behavior)
-        return True
+    results = local_index.search(query, max_list)
+    if not results:
+        return None
 
-    except (httpx.HTTPStatusError, httpx.TimeoutException, httpx.ConnectError) as e:
-        logging.warning(f"HTTP request attempt 1 failed: {type(e).__name__}: {e}")
+    logging.info(f"ICD-10 query answered locally with {results}")
+    return results
 
-        # Try again in [count] seconds
-        attempt_count = 1
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # Make 5 total request attempts
-            while attempt_count <= 5:
-                # Sleep for a bit
-                sleep_time = attempt_count
-                logging.info(f"Waiting {sleep_time} seconds...")
-                await asyncio.sleep(sleep_time)
 
-                try:
-                    logging.debug(f"HTTP GET attempt to {url}")
+# Query NIH for [code, name] pairs, serving repeats from cache and sharing one request between identical callers
+async def _search_nih(query: str, max_list: int) -> list:
+    terms = normalize_query(query)
 
-                    response = await client.get(url)
-                    response.raise_for_status()
+    async def fetch():
+        response = await _make_request(NIH_URL, {'sf': 'code,name', 'terms': terms, 'maxList': max_list})
+        if response is False:
+            return None
 
-                    # Exit if there are no errors
-                    return response
+        # Parse response
+        response_body = response.json()[3]
+        logging.info(f"ICD-10 query returned {response_body}")
+        return response_body
 
-                except (httpx.HTTPStatusError, httpx.TimeoutException, httpx.ConnectError) as e:
-                    # Try again if the request failed
-                    logging.warning(f"HTTP request attempt {attempt_count} failed: {type(e).__name__}: {e}")
-                    attempt_count += 1
+    # Failed requests are not cached so the next call retries upstream
+    results = await cached_call(nih_cache, nih_flight, (terms, max_list), fetch, lambda body: body is not None)
+    return results if results is not None else []
 
-                except Exception as e:
-                    # Abort if an unusual error is caught
-                    logging.error(f"Unexpected error in HTTP request: {e}")
-                    return False
 
-    except Exception as e:
-        # Abort if an unusual error is caught
-        logging.error(f"Unexpected error in HTTP request from NIH: {e}")
-        return False
+@app.custom_route("/stats", methods=["GET"])
+async def stats(request: Request) -> JSONResponse:
+    return JSONResponse({"http": nih_client.stats(), "cache": nih_cache.stats(), "coalescing": nih_flight.stats()})
 
 
 @app.tool(description="Search the National Institute of Health (NIH) database on International Classification of "
@@ -73,14 +100,13 @@ async def _make_request(url: str):
 async def get_icd10_code_basic(query: str) -> list:
     logging.info(f"Querying NIH ICD-10 for: {query}")
 
-    # Make request
-    nih_url = f'https://clinicaltables.nlm.nih.gov/api/icd10cm/v3/search?sf=code,name&terms={query}'
-    response = await _make_request(nih_url)
+    # Try the local index first, NIH returns 7 results by default so basic and advanced lookups share cache entries
+    local_results = _local_lookup(query, 7)
+    if local_results is not None:
+        return local_results
 
-    # Parse response
-    response_body = response.json()[3]
-    logging.info(f"ICD-10 query returned {response_body}")
-    return response_body
+    # Query NIH through the response cache
+    return await _search_nih(query, 7)
 
 
 @app.tool(description="Search the National Institute of Health (NIH) database on International Classification of "
@@ -92,14 +118,13 @@ async def get_icd10_code_basic(query: str) -> list:
 async def get_icd10_code_advanced(query: str, max_list: int = 7) -> list:
     logging.info(f"Querying NIH ICD-10 for {max_list} results related to: {query}")
 
-    # Make request
-    nih_url = f'https://clinicaltables.nlm.nih.gov/api/icd10cm/v3/search?sf=code,name&terms={query}&maxList={max_list}'
-    response = await _make_request(nih_url)
+    # Try the local index first
+    local_results = _local_lookup(query, max_list)
+    if local_results is not None:
+        return local_results
 
-    # Parse response
-    response_body = response.json()[3]
-    logging.info(f"ICD-10 query returned {response_body}")
-    return response_body
+    # Query NIH through the response cache
+    return await _search_nih(query, max_list)
 
 
 def startup():
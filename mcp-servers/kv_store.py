@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteStore:
+    """
+    Persistent JSON key-value store on SQLite with least-recently-used eviction.
+
+    Entries beyond `max_rows` are evicted by last access time, and entries older than `ttl` seconds (None disables
+    expiry) are treated as misses. Calls are blocking; async callers should wrap them in asyncio.to_thread.
+    """
+
+    def __init__(self, path: str, table: str = "entries", max_rows: Optional[int] = None, ttl: Optional[float] = None):
+        self.path = path
+        self.table = table
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)")
+        self._connection.commit()
+
+        # Counters exposed through stats()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        now = time.time()
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT key, value, created_at FROM {self.table} WHERE key IN ({placeholders})", batch
+                ).fetchall()
+
+                for key, value, created_at in rows:
+                    if self.ttl is not None and now - created_at > self.ttl:
+                        continue
+                    found[key] = json.loads(value)
+
+            if found:
+                self._connection.executemany(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._connection.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def put_many(self, items: Dict[str, Any]):
+        if not items:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(value), now, now) for key, value in items.items()]
+            )
+            self._evict()
+            self._connection.commit()
+
+    def put(self, key: str, value: Any):
+        self.put_many({key: value})
+
+    def items(self) -> Dict[str, Any]:
+        """Every unexpired entry, without touching access times"""
+        now = time.time()
+        with self._lock:
+            rows = self._connection.execute(f"SELECT key, value, created_at FROM {self.table}").fetchall()
+        return {key: json.loads(value) for key, value, created_at in rows
+                if self.ttl is None or now - created_at <= self.ttl}
+
+    def _evict(self):
+        if self.max_rows is None:
+            return
+
+        overflow = self._count() - self.max_rows
+        if overflow <= 0:
+            return
+
+        self._connection.execute(
+            f"DELETE FROM {self.table} WHERE key IN "
+            f"(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)", (overflow,)
+        )
+        self.evictions += overflow
+        logger.info(f"Evicted {overflow} least recently used entries from {self.path}:{self.table}.")
+
+    def _count(self) -> int:
+        return self._connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            size = self._count()
+        return {
+            "size": size,
+            "max_size": self.max_rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
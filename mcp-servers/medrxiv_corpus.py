@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import datetime
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from http_client import PooledHTTPClient
+from medrxiv_web_search import HEADERS, _format_metadata
+
+logger = logging.getLogger(__name__)
+
+DETAILS_URL = "https://api.medrxiv.org/details/medrxiv/{start}/{end}/{cursor}/json"
+
+# The details API serves 100 preprints per page
+PAGE_SIZE = 100
+
+# Concurrent page requests during ingestion
+PAGE_CONCURRENCY = int(os.getenv('MEDRXIV_CORPUS_PAGE_CONCURRENCY', 4))
+
+# How far back the first ingestion reaches, later refreshes continue from the stored date cursor
+INITIAL_DAYS = int(os.getenv('MEDRXIV_CORPUS_INITIAL_DAYS', 90))
+
+# Title matches weigh more than abstract matches in BM25 ranking
+TITLE_WEIGHT = 5.0
+ABSTRACT_WEIGHT = 1.0
+
+CORPUS_PATH = os.getenv('MEDRXIV_CORPUS_PATH', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'cache', 'medrxiv_corpus.sqlite3'))
+
+CORPUS_COLUMNS = ["doi", "version", "title", "authors", "author_corresponding", "author_corresponding_institution",
+                  "date", "category", "jatsxml", "abstract"]
+
+
+class MedrxivCorpus:
+    """
+    Local mirror of medRxiv preprint metadata with an FTS5 (BM25) index over titles and abstracts.
+
+    Only the latest version of each DOI is kept. SQLite calls are blocking; the async methods run them in a worker
+    thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._refresh_task = None
+        self._last_refresh = None
+        self._last_failure = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS preprints ({", ".join(f"{column} TEXT" for column in CORPUS_COLUMNS)},
+                                                  PRIMARY KEY (doi));
+            CREATE VIRTUAL TABLE IF NOT EXISTS preprints_fts USING fts5(doi UNINDEXED, title, abstract,
+                                                                        tokenize='porter unicode61');
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+        self._connection.commit()
+
+    # --- Storage ---------------------------------------------------------------------------------------------------
+
+    def _get_meta(self, key):
+        row = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def cursor_date(self):
+        with self._lock:
+            value = self._get_meta("cursor_date")
+        return datetime.date.fromisoformat(value) if value else None
+
+    def last_refresh(self):
+        with self._lock:
+            value = self._get_meta("last_refresh")
+        return float(value) if value else None
+
+    def size(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM preprints").fetchone()[0]
+
+    def upsert(self, preprints):
+        """Store a page of details API records, keeping only the newest version of each DOI"""
+        rows = [{column: str(preprint.get(column) or "") for column in CORPUS_COLUMNS} for preprint in preprints]
+
+        with self._lock:
+            for row in rows:
+                existing = self._connection.execute(
+                    "SELECT version FROM preprints WHERE doi = ?", (row["doi"],)
+                ).fetchone()
+                if existing and _version_number(existing[0]) > _version_number(row["version"]):
+                    continue
+
+                self._connection.execute(
+                    f"INSERT OR REPLACE INTO preprints ({', '.join(CORPUS_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(CORPUS_COLUMNS))})",
+                    [row[column] for column in CORPUS_COLUMNS]
+                )
+                self._connection.execute("DELETE FROM preprints_fts WHERE doi = ?", (row["doi"],))
+                self._connection.execute(
+                    "INSERT INTO preprints_fts (doi, title, abstract) VALUES (?, ?, ?)",
+                    (row["doi"], row["title"], row["abstract"])
+                )
+            self._connection.commit()
+
+    def search(self, key_words, num_results=10):
+        """BM25-ranked search returning the same dict shape as search_medrxiv_key_words"""
+        match = _fts_query(key_words)
+        if not match:
+            return []
+
+        with self._lock:
+            self._connection.row_factory = sqlite3.Row
+            try:
+                rows = self._connection.execute(
+                    "SELECT p.* FROM preprints_fts f JOIN preprints p ON p.doi = f.doi "
+                    "WHERE preprints_fts MATCH ? ORDER BY bm25(preprints_fts, 0.0, ?, ?) LIMIT ?",
+                    (match, TITLE_WEIGHT, ABSTRACT_WEIGHT, num_results)
+                ).fetchall()
+            finally:
+                self._connection.row_factory = None
+
+        return [_format_result(dict(row)) for row in rows]
+
+    # --- Ingestion -------------------------------------------------------------------------------------------------
+
+    async def ingest(self, start_date, end_date, client=None):
+        """Pull every preprint posted between start_date and end_date (inclusive) from the details API"""
+        owns_client = client is None
+        client = client or PooledHTTPClient(timeout=60.0, headers=HEADERS)
+        try:
+            return await self._ingest(client, start_date.isoformat(), end_date.isoformat())
+        finally:
+            if owns_client:
+                await client.aclose()
+
+    async def _ingest(self, client, start, end):
+        async def fetch_page(cursor):
+            response = await client.get(DETAILS_URL.format(start=start, end=end, cursor=cursor))
+            data = response.json()
+            await asyncio.to_thread(self.upsert, data.get("collection", []))
+            return data
+
+        # The first page reports the total, the remaining pages are fetched concurrently
+        first_page = await fetch_page(0)
+        messages = first_page.get("messages", [{}])
+        total = int(messages[0].get("total", 0) or 0)
+        logger.info(f"Ingesting {total} medRxiv preprints posted {start} to {end}...")
+
+        semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
+
+        async def bounded_fetch(cursor):
+            async with semaphore:
+                await fetch_page(cursor)
+
+        await asyncio.gather(*(bounded_fetch(cursor) for cursor in range(PAGE_SIZE, total, PAGE_SIZE)))
+        return total
+
+    async def refresh(self, today=None):
+        """Incrementally ingest from the stored date cursor (re-reading its day for late postings) up to today"""
+        today = today or datetime.date.today()
+        cursor = await asyncio.to_thread(self.cursor_date)
+        start = cursor if cursor is not None else today - datetime.timedelta(days=INITIAL_DAYS)
+
+        total = await self.ingest(start, today)
+
+        refreshed_at = time.time()
+
+        def save_cursor():
+            with self._lock:
+                self._set_meta("cursor_date", today.isoformat())
+                self._set_meta("last_refresh", str(refreshed_at))
+                self._connection.commit()
+
+        await asyncio.to_thread(save_cursor)
+        self._last_refresh = refreshed_at
+        logger.info(f"medRxiv corpus refreshed through {today}, {total} preprints ingested.")
+        return total
+
+    def schedule_refresh(self, interval):
+        """Start a background refresh if the last one is older than `interval` seconds and none is running"""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+
+        # Called from tool handlers, so only the in-memory copy of the last refresh time is checked on the event loop
+        if self._attempted_within(interval):
+            return
+
+        self._refresh_task = asyncio.create_task(self._refresh_if_stale(interval))
+
+    def _attempted_within(self, interval):
+        # Failed refreshes count as attempts, so an unreachable API is retried once per interval rather than per call
+        attempts = [t for t in (self._last_refresh, self._last_failure) if t is not None]
+        return bool(attempts) and time.time() - max(attempts) < interval
+
+    async def _refresh_if_stale(self, interval):
+        if self._last_refresh is None:
+            self._last_refresh = await asyncio.to_thread(self.last_refresh)
+        if self._attempted_within(interval):
+            return
+
+        try:
+            await self.refresh()
+        except Exception as e:
+            self._last_failure = time.time()
+            logger.error(f"medRxiv corpus refresh failed: {type(e).__name__}: {e}")
+
+
+def _version_number(version):
+    try:
+        return int(version)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _fts_query(key_words):
+    # Quote every term so user input can never be read as FTS5 syntax, OR them so BM25 ranks partial matches too
+    terms = re.findall(r"\w+", key_words.lower())
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def _format_result(row):
+    doi = row["doi"]
+    result = {
+        "Title": row["title"] or "No title",
+        "Authors": row["authors"] or "No authors",
+        "DOI_link": f"https://doi.org/{doi}",
+        "Link": f"https://www.medrxiv.org/content/{doi}v{row['version']}" if row["version"] else "No link"
+    }
+    metadata = _format_metadata({"collection": [{**row, "jats xml path": row["jatsxml"]}]}, doi)
+    if metadata:
+        result.update(metadata)
+    return result
+
+
+if __name__ == '__main__':
+    # Ingestion job, e.g. from cron: python medrxiv_corpus.py --refresh
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Mirror medRxiv preprint metadata into a local full-text index.")
+    parser.add_argument("--path", default=CORPUS_PATH)
+    parser.add_argument("--refresh", action="store_true", help="Ingest from the stored date cursor up to today")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="Ingest a date range (YYYY-MM-DD)")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=datetime.date.today())
+    parser.add_argument("--search", help="Query the local index")
+    args = parser.parse_args()
+
+    corpus = MedrxivCorpus(args.path)
+    if args.start:
+        asyncio.run(corpus.ingest(args.start, args.end))
+    if args.refresh:
+        asyncio.run(corpus.refresh())
+    if args.search:
+        for article in corpus.search(args.search, 5):
+            print(f"{article['Date']}  {article['DOI']}  {article['Title']}")
+    logger.info(f"Corpus at {args.path} holds {corpus.size()} preprints.")
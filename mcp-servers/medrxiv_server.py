@@ -1,8 +1,13 @@
 from typing import Any, List, Dict, Optional
 import asyncio
 import logging
+import os
 from mcp.server.fastmcp import FastMCP
-from medrxiv_web_search import search_key_words, search_advanced, doi_get_medrxiv_metadata
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from medrxiv_web_search import search_key_words_async, search_advanced_async, doi_get_medrxiv_metadata_async, \
+    doi_cache, doi_flight, medrxiv_client
+from medrxiv_corpus import CORPUS_PATH, MedrxivCorpus
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -10,6 +15,10 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Initialize FastMCP server
 mcp = FastMCP("medrxiv", host="0.0.0.0", port=8002)
 
+# Local preprint mirror, filled by `python medrxiv_corpus.py --refresh` and refreshed in the background while serving
+corpus = MedrxivCorpus(CORPUS_PATH)
+CORPUS_REFRESH_INTERVAL = float(os.getenv('MEDRXIV_CORPUS_REFRESH_HOURS', 24)) * 3600
+
 
 @mcp.tool()
 async def search_medrxiv_key_words(key_words: str, num_results: int = 10) -> List[Dict[str, Any]]:
@@ -27,12 +36,40 @@ async def search_medrxiv_key_words(key_words: str, num_results: int = 10) -> Lis
     logging.info(f"Searching for articles with key words: {key_words}, num_results: {num_results}")
 
     try:
-        results = await asyncio.to_thread(search_key_words, key_words, num_results)
+        results = await search_key_words_async(key_words, num_results)
         return results
     except Exception as e:
         return [{"error": f"An error occurred while searching: {str(e)}"}]
 
 
+@mcp.tool()
+async def search_medrxiv_local(key_words: str, num_results: int = 10) -> List[Dict[str, Any]]:
+    """
+    Search a local mirror of recent medRxiv preprints using keywords, ranked by relevance. Faster than
+    search_medrxiv_key_words but limited to preprints posted since the mirror was created.
+
+    Args:
+        key_words: Search query string
+        num_results: Number of results to return (default: 10)
+
+    Returns:
+        List of dictionaries containing article information
+    """
+
+    logging.info(f"Searching local medRxiv corpus for: {key_words}, num_results: {num_results}")
+
+    # Keep the mirror current without putting ingestion on the request path
+    corpus.schedule_refresh(CORPUS_REFRESH_INTERVAL)
+
+    try:
+        results = await asyncio.to_thread(corpus.search, key_words, num_results)
+        if not results and not await asyncio.to_thread(corpus.size):
+            return [{"error": "The local medRxiv corpus is empty, use search_medrxiv_key_words instead."}]
+        return results
+    except Exception as e:
+        return [{"error": f"An error occurred while searching the local corpus: {str(e)}"}]
+
+
 @mcp.tool()
 async def search_medrxiv_advanced(
     term: Optional[str] = None,
@@ -68,8 +105,7 @@ async def search_medrxiv_advanced(
     logging.info(f"Performing advanced search with parameters: {locals()}")
 
     try:
-        results = await asyncio.to_thread(
-            search_advanced,
+        results = await search_advanced_async(
             term, title, author1, author2, abstract_title, text_abstract_title,
             section, start_date, end_date, num_results
         )
@@ -95,12 +131,22 @@ async def get_medrxiv_metadata(doi: str) -> Dict[str, Any]:
     logging.info(f"Fetching metadata for DOI: {doi}")
 
     try:
-        metadata = await asyncio.to_thread(doi_get_medrxiv_metadata, doi)
+        metadata = await doi_get_medrxiv_metadata_async(doi)
         return metadata if metadata else {"error": f"No metadata found for DOI: {doi}"}
     except Exception as e:
         return {"error": f"An error occurred while fetching metadata: {str(e)}"}
 
 
+@mcp.custom_route("/stats", methods=["GET"])
+async def stats(request: Request) -> JSONResponse:
+    return JSONResponse({
+        "http": medrxiv_client.stats(),
+        "doi_cache": await asyncio.to_thread(doi_cache.stats),
+        "doi_coalescing": doi_flight.stats(),
+        "corpus_size": await asyncio.to_thread(corpus.size),
+    })
+
+
 if __name__ == "__main__":
     try:
         mcp.run(transport='streamable-http')
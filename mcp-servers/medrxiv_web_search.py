@@ -1,10 +1,104 @@
+import asyncio
+import os
+import re
+import threading
 import requests
-from bs4 import BeautifulSoup
+import httpx
+from bs4 import BeautifulSoup, SoupStrainer
 from urllib.parse import quote
 import logging
+from http_client import PooledHTTPClient
+from kv_store import SQLiteStore
+from ttl_cache import MISSING, SingleFlight, TTLCache
+
+# Optional fast HTML parsers, see HTML_BACKENDS
+try:
+    from lxml import etree as lxml_etree, html as lxml_html
+except ImportError:
+    lxml_etree = lxml_html = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
 
 logger = logging.getLogger(__name__)
 
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36'
+}
+
+# Pooled client for the async path, shared by search page and metadata requests
+medrxiv_client = PooledHTTPClient(timeout=30.0, headers=HEADERS)
+
+# Upper bound on concurrent DOI metadata requests per search
+METADATA_CONCURRENCY = int(os.getenv('MEDRXIV_METADATA_CONCURRENCY', 8))
+
+
+class DOIMetadataCache:
+    """
+    Two-tier DOI metadata cache: a bounded in-memory LRU in front of a persistent SQLite store.
+
+    Metadata for a DOI+version never changes, but unversioned lookups resolve to the latest version, so entries
+    still expire after `ttl` seconds to pick up newly posted versions. Disk lookups run in worker threads while the
+    event loop reads the memory tier, so every memory access holds `_memory_lock`.
+    """
+
+    def __init__(self, path, memory_size=1024, max_rows=50000, ttl=30 * 24 * 3600):
+        self.memory = TTLCache(max_size=memory_size, ttl=ttl)
+        self._memory_lock = threading.Lock()
+        self.disk = SQLiteStore(path, 'doi_metadata', max_rows=max_rows, ttl=ttl) if path else None
+
+    @staticmethod
+    def key(doi, server):
+        return f"{server}:{doi.strip().lower()}"
+
+    def get_memory(self, key):
+        with self._memory_lock:
+            return self.memory.get(key)
+
+    def set_memory(self, key, value):
+        with self._memory_lock:
+            self.memory.set(key, value)
+
+    def get_disk(self, key):
+        """Disk lookup, promoting hits into memory. Blocking, async callers should use asyncio.to_thread"""
+        if self.disk is None:
+            return MISSING
+
+        value = self.disk.get(key, MISSING)
+        if value is not MISSING:
+            self.set_memory(key, value)
+        return value
+
+    def get(self, key):
+        value = self.get_memory(key)
+        return value if value is not MISSING else self.get_disk(key)
+
+    def set(self, key, value):
+        self.set_memory(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def stats(self):
+        with self._memory_lock:
+            memory_stats = self.memory.stats()
+        return {
+            "memory": memory_stats,
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
+
+
+# Set MEDRXIV_DOI_CACHE_PATH to an empty string to keep the DOI cache in memory only
+doi_cache = DOIMetadataCache(
+    os.getenv('MEDRXIV_DOI_CACHE_PATH',
+              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'medrxiv_doi_metadata.sqlite3')),
+    memory_size=int(os.getenv('MEDRXIV_DOI_CACHE_MEMORY_SIZE', 1024)),
+    max_rows=int(os.getenv('MEDRXIV_DOI_CACHE_MAX_ROWS', 50000)),
+    ttl=float(os.getenv('MEDRXIV_DOI_CACHE_TTL', 30 * 24 * 3600)),
+)
+doi_flight = SingleFlight()
+
 
 def generate_medrxiv_search_url(term=None, title=None, author1=None, author2=None, abstract_title=None, 
                                 text_abstract_title=None, journal_code="medrxiv", section=None,
@@ -37,47 +131,166 @@ def generate_medrxiv_search_url(term=None, title=None, author1=None, author2=Non
 
     return base_url + "%20".join(query_parts)
 
+def _make_result(title, authors, href, doi_text):
+    return {
+        "Title": title.strip() if title is not None else "No title",
+        "Authors": authors.strip() if authors is not None else "No authors",
+        "DOI_link": doi_text.strip().replace("doi:", "").strip() if doi_text is not None else "No DOI",
+        "Link": "https://www.medrxiv.org" + href if href is not None else "No link"
+    }
+
+
+def _extract_bs4(html, parse_only=None, parser='html.parser'):
+    soup = BeautifulSoup(html, parser, parse_only=parse_only)
+
+    results = []
+    for article in soup.find_all('li', class_='search-result'):
+        title_tag = article.find('span', class_='highwire-cite-title')
+        authors_tag = article.find('span', class_='highwire-citation-authors')
+        link_tag = article.find('a', class_='highwire-cite-linked-title')
+        doi_tag = article.find('span', class_='highwire-cite-metadata-doi')
+
+        results.append(_make_result(
+            title_tag.text if title_tag else None,
+            authors_tag.text if authors_tag else None,
+            link_tag['href'] if link_tag else None,
+            doi_tag.text if doi_tag else None,
+        ))
+
+    return results
+
+
+# Matched against the raw class attribute during parsing, before BeautifulSoup splits it into a list
+SEARCH_RESULT_CLASS = re.compile(r'(^|\s)search-result(\s|$)')
+
+
+def _extract_strainer(html):
+    # Only build tree nodes for result items, everything else on the page is skipped during parsing
+    parse_only = SoupStrainer('li', class_=SEARCH_RESULT_CLASS)
+    return _extract_bs4(html, parse_only, 'lxml' if lxml_html is not None else 'html.parser')
+
+
+def _xpath_class(tag, class_name):
+    return f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+
+def _extract_lxml(html):
+    # lxml refuses empty documents where the other backends find no results
+    if not html or not html.strip():
+        return []
+
+    try:
+        tree = lxml_html.fromstring(html)
+    except lxml_etree.ParserError:
+        return []
+
+    def first(item, tag, class_name):
+        found = item.xpath(_xpath_class(tag, class_name))
+        return found[0] if found else None
+
+    results = []
+    for article in tree.xpath(_xpath_class('li', 'search-result')):
+        title_tag = first(article, 'span', 'highwire-cite-title')
+        authors_tag = first(article, 'span', 'highwire-citation-authors')
+        link_tag = first(article, 'a', 'highwire-cite-linked-title')
+        doi_tag = first(article, 'span', 'highwire-cite-metadata-doi')
+
+        results.append(_make_result(
+            title_tag.text_content() if title_tag is not None else None,
+            authors_tag.text_content() if authors_tag is not None else None,
+            link_tag.get('href') if link_tag is not None else None,
+            doi_tag.text_content() if doi_tag is not None else None,
+        ))
+
+    return results
+
+
+def _extract_selectolax(html):
+    tree = SelectolaxParser(html)
+
+    results = []
+    for article in tree.css('li.search-result'):
+        title_tag = article.css_first('span.highwire-cite-title')
+        authors_tag = article.css_first('span.highwire-citation-authors')
+        link_tag = article.css_first('a.highwire-cite-linked-title')
+        doi_tag = article.css_first('span.highwire-cite-metadata-doi')
+
+        results.append(_make_result(
+            title_tag.text() if title_tag is not None else None,
+            authors_tag.text() if authors_tag is not None else None,
+            link_tag.attributes.get('href') if link_tag is not None else None,
+            doi_tag.text() if doi_tag is not None else None,
+        ))
+
+    return results
+
+
+# Extraction backends by name, optional ones are only registered when their package is installed
+HTML_BACKENDS = {
+    'html.parser': _extract_bs4,
+    'strainer': _extract_strainer,
+}
+if lxml_html is not None:
+    HTML_BACKENDS['lxml'] = _extract_lxml
+if SelectolaxParser is not None:
+    HTML_BACKENDS['selectolax'] = _extract_selectolax
+
+
+def _resolve_html_backend(name):
+    if name == 'auto':
+        for candidate in ('selectolax', 'lxml', 'strainer'):
+            if candidate in HTML_BACKENDS:
+                return candidate
+
+    if name not in HTML_BACKENDS:
+        logger.warning(f"HTML backend {name} is unavailable, falling back to html.parser. "
+                       f"Available backends: {', '.join(HTML_BACKENDS)}")
+        return 'html.parser'
+
+    return name
+
+
+HTML_BACKEND = _resolve_html_backend(os.getenv('MEDRXIV_HTML_BACKEND', 'auto'))
+
+
+def _parse_search_results(html, backend=None):
+    """Extract Title/Authors/DOI_link/Link from each result item of a medRxiv search page"""
+    return HTML_BACKENDS[backend or HTML_BACKEND](html)
+
+
+def _format_metadata(data, doi):
+    """Map a medRxiv details API response to the metadata dict returned by the tools"""
+    if 'collection' in data and len(data['collection']) > 0:
+        article = data['collection'][0]
+        return {
+            "DOI": article.get("doi", "No DOI"),
+            "Title": article.get("title", "No title"),
+            "Authors": article.get("authors", "No authors"),
+            "Corresponding Author": article.get("author_corresponding", "No corresponding author"),
+            "Corresponding Institution": article.get("author_corresponding_institution", "No institution"),
+            "Date": article.get("date", "No date"),
+            "Version": article.get("version", "No version"),
+            "Category": article.get("category", "No category"),
+            "JATS XML Path": article.get("jats xml path", "No XML path"),
+            "Abstract": article.get("abstract", "No abstract")
+        }
+    else:
+        logger.info(f"No data found for DOI: {doi}")
+        return None
+
+
 def scrape_medrxiv_results(search_url):
     """Parse article information from medRxiv search results pages, including DOI"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36'
-    }
-    response = requests.get(search_url, headers=headers)
+    response = requests.get(search_url, headers=HEADERS)
 
     if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        articles = soup.find_all('li', class_='search-result')
-
-        results = []
-        for article in articles:
-            title_tag = article.find('span', class_='highwire-cite-title')
-            title = title_tag.text.strip() if title_tag else "No title"
-
-            authors_tag = article.find('span', class_='highwire-citation-authors')
-            authors = authors_tag.text.strip() if authors_tag else "No authors"
-
-            abstract_tag = article.find('div', class_='highwire-cite-snippet')
-            abstract = abstract_tag.text.strip() if abstract_tag else "No abstract"
-
-            link_tag = article.find('a', class_='highwire-cite-linked-title')
-            link = "https://www.medrxiv.org" + link_tag['href'] if link_tag else "No link"
-
-            doi_tag = article.find('span', class_='highwire-cite-metadata-doi')
-            doi_link = doi_tag.text.strip().replace("doi:", "").strip() if doi_tag else "No DOI"
-
-            result = {
-                "Title": title,
-                "Authors": authors,
-                "DOI_link": doi_link,
-                "Link": link
-            }
-            if doi_link != "No DOI":
-                metadata = doi_get_medrxiv_metadata(doi_link.replace("https://doi.org/", ""))
+        results = _parse_search_results(response.text)
+        for result in results:
+            if result["DOI_link"] != "No DOI":
+                metadata = doi_get_medrxiv_metadata(result["DOI_link"].replace("https://doi.org/", ""))
                 if metadata:
                     result.update(metadata)
 
-            results.append(result)
-        
         return results
     else:
         logger.error(f"Unable to fetch data (status code: {response.status_code})")
@@ -85,36 +298,86 @@ def scrape_medrxiv_results(search_url):
 
 def doi_get_medrxiv_metadata(doi, server="medrxiv"):
     """Use the medRxiv API to retrieve detailed article metadata via DOI"""
+    cache_key = doi_cache.key(doi, server)
+    metadata = doi_cache.get(cache_key)
+    if metadata is not MISSING:
+        return metadata
+
     url = f"https://api.medrxiv.org/details/{server}/{doi}/na/json"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36'
-    }
-    
-    response = requests.get(url, headers=headers)
-    
+
+    response = requests.get(url, headers=HEADERS)
+
     if response.status_code == 200:
-        data = response.json()
-        if 'collection' in data and len(data['collection']) > 0:
-            article = data['collection'][0]
-            return {
-                "DOI": article.get("doi", "No DOI"),
-                "Title": article.get("title", "No title"),
-                "Authors": article.get("authors", "No authors"),
-                "Corresponding Author": article.get("author_corresponding", "No corresponding author"),
-                "Corresponding Institution": article.get("author_corresponding_institution", "No institution"),
-                "Date": article.get("date", "No date"),
-                "Version": article.get("version", "No version"),
-                "Category": article.get("category", "No category"),
-                "JATS XML Path": article.get("jats xml path", "No XML path"),
-                "Abstract": article.get("abstract", "No abstract")
-            }
-        else:
-            logger.info(f"No data found for DOI: {doi}")
-            return None
+        metadata = _format_metadata(response.json(), doi)
+        if metadata:
+            doi_cache.set(cache_key, metadata)
+        return metadata
     else:
         logger.error(f"Unable to fetch metadata (status code: {response.status_code})")
         return None
 
+
+async def scrape_medrxiv_results_async(search_url):
+    """Async scrape_medrxiv_results: one search page request, then every DOI's metadata fetched concurrently"""
+    try:
+        response = await medrxiv_client.get(search_url)
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Unable to fetch data (status code: {e.response.status_code})")
+        return None
+
+    # Parsing is CPU-bound, keep it off the event loop
+    results = await asyncio.to_thread(_parse_search_results, response.text)
+
+    semaphore = asyncio.Semaphore(METADATA_CONCURRENCY)
+
+    async def add_metadata(result):
+        if result["DOI_link"] == "No DOI":
+            return
+
+        async with semaphore:
+            metadata = await doi_get_medrxiv_metadata_async(result["DOI_link"].replace("https://doi.org/", ""))
+        if metadata:
+            result.update(metadata)
+
+    await asyncio.gather(*(add_metadata(result) for result in results))
+    return results
+
+
+async def doi_get_medrxiv_metadata_async(doi, server="medrxiv"):
+    """Async doi_get_medrxiv_metadata using the DOI cache, then the pooled client on a miss"""
+    cache_key = doi_cache.key(doi, server)
+    metadata = doi_cache.get_memory(cache_key)
+    if metadata is MISSING:
+        # Concurrent lookups of the same DOI share one disk read and upstream request
+        metadata = await doi_flight.do(cache_key, lambda: _load_doi_metadata(cache_key, doi, server))
+    return metadata
+
+
+async def _load_doi_metadata(cache_key, doi, server):
+    metadata = await asyncio.to_thread(doi_cache.get_disk, cache_key)
+    if metadata is not MISSING:
+        return metadata
+
+    metadata = await _fetch_doi_metadata(doi, server)
+    if metadata:
+        await asyncio.to_thread(doi_cache.set, cache_key, metadata)
+    return metadata
+
+
+async def _fetch_doi_metadata(doi, server):
+    url = f"https://api.medrxiv.org/details/{server}/{doi}/na/json"
+
+    try:
+        response = await medrxiv_client.get(url)
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Unable to fetch metadata (status code: {e.response.status_code})")
+        return None
+    except httpx.TransportError as e:
+        logger.error(f"Unable to fetch metadata for DOI {doi}: {type(e).__name__}: {e}")
+        return None
+
+    return _format_metadata(response.json(), doi)
+
 def search_key_words(key_words, num_results=10):
     # Generate search URL
     search_url = generate_medrxiv_search_url(term=key_words, num_results=num_results)
@@ -143,6 +406,27 @@ def search_advanced(term, title, author1, author2, abstract_title, text_abstract
     return articles
 
 
+async def search_key_words_async(key_words, num_results=10):
+    search_url = generate_medrxiv_search_url(term=key_words, num_results=num_results)
+
+    logger.info(f"Generated URL: {search_url}")
+
+    return await scrape_medrxiv_results_async(search_url)
+
+
+async def search_advanced_async(term, title, author1, author2, abstract_title, text_abstract_title, section,
+                                start_date, end_date, num_results):
+    search_url = generate_medrxiv_search_url(term, title=title, author1=author1, author2=author2,
+                                            abstract_title=abstract_title,
+                                            text_abstract_title=text_abstract_title,
+                                            section=section, start_date=start_date,
+                                            end_date=end_date, num_results=num_results)
+
+    logger.info(f"Generated URL: {search_url}")
+
+    return await scrape_medrxiv_results_async(search_url)
+
+
 if __name__ == "__main__":
     # 1. search_key_words 
     key_words = "lung inflammation"
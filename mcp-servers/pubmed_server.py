@@ -1,10 +1,17 @@
+import asyncio
 import logging
-from typing import List, Optional
+import os
+import sqlite3
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Union
 import xml.etree.ElementTree as ET
 from pydantic import BaseModel
 import httpx
 from fastapi import HTTPException
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from http_client import RateLimiter
+from kv_store import SQLiteStore
 
 # Create an MCP server
 mcp_server = FastMCP(name="Pubmed Server", host="0.0.0.0", port=8001)
@@ -28,6 +35,32 @@ class PubMedArticle(BaseModel):
 
 
 base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+
+# Slice size used when feeding efetch XML to the streaming parser
+XML_CHUNK_SIZE = 64 * 1024
+
+# NCBI allows 3 requests/second without an API key and 10 with one
+NCBI_API_KEY = os.getenv("NCBI_API_KEY")
+ncbi_rate_limiter = RateLimiter(10 if NCBI_API_KEY else 3)
+
+# Result sets larger than one batch are fetched through the E-utilities history server in concurrent chunks
+EFETCH_BATCH_SIZE = int(os.getenv("PUBMED_EFETCH_BATCH_SIZE", 100))
+
+# Persistent PMID-keyed store of parsed articles, set PUBMED_STORE_PATH to an empty string to disable it
+PUBMED_STORE_PATH = os.getenv(
+    "PUBMED_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "pubmed_articles.sqlite3")
+)
+PUBMED_STORE_MAX_ARTICLES = int(os.getenv("PUBMED_STORE_MAX_ARTICLES", 100000))
+
+# Stored articles are refetched after this many seconds to pick up corrected metadata
+PUBMED_STORE_TTL = float(os.getenv("PUBMED_STORE_TTL", 30 * 24 * 3600))
+article_store = SQLiteStore(PUBMED_STORE_PATH, "articles", max_rows=PUBMED_STORE_MAX_ARTICLES,
+                            ttl=PUBMED_STORE_TTL) if PUBMED_STORE_PATH else None
+
+# Stand-ins for missing fields, articles carrying them are not stored so they are refetched once PubMed has the data
+NO_TITLE = "No title available"
+NO_ABSTRACT = "No abstract available"
+
 http_client = httpx.AsyncClient(timeout=30.0)
 
 
@@ -36,127 +69,302 @@ async def search_pubmed(
     query: str,
     max_results: int = 10,
     sort: str = "relevance",
-    date_range: Optional[str] = None
+    date_range: Optional[str] = None,
+    ctx: Context | None = None
 ) -> List[PubMedArticle]:
     """Search PubMed database"""
     try:
-        # First, search for PMIDs
-        search_url = f"{base_url}/esearch.fcgi"
-        search_params = {
-            "db": "pubmed",
-            "term": query,
-            "retmax": max_results,
-            "retmode": "json",
-            "sort": sort
-        }
-
-        if date_range:
-            search_params["datetype"] = "pdat"
-            search_params["reldate"] = date_range
-
-        search_response = await http_client.get(search_url, params=search_params)
-        search_response.raise_for_status()
-        search_data = search_response.json()
-
-        pmids = search_data.get("esearchresult", {}).get("idlist", [])
+        use_history = max_results > EFETCH_BATCH_SIZE
+        search_result = await _esearch(query, max_results, sort, date_range, use_history)
 
+        pmids = search_result.get("idlist", [])
         if not len(pmids):
             return []
 
-        # Fetch detailed information for each PMID
-        fetch_url = f"{base_url}/efetch.fcgi"
-        fetch_params = {
-            "db": "pubmed",
-            "id": ",".join(pmids),
-            "retmode": "xml",
-            "rettype": "abstract"
-        }
+        # Collect batches as they complete, reporting progress to clients that asked for it, then restore esearch
+        # ordering
+        articles = {}
+        async for batch in _stream_pubmed_articles(pmids, search_result):
+            for article in batch:
+                articles[article.pmid] = article
+            if ctx is not None:
+                await ctx.report_progress(len(articles), len(pmids))
 
-        fetch_response = await http_client.get(fetch_url, params=fetch_params)
-        fetch_response.raise_for_status()
-
-        return _parse_pubmed_xml(fetch_response.text)
+        return [articles[pmid] for pmid in pmids if pmid in articles]
 
     except Exception as e:
         logger.error(f"PubMed search failed: {e}")
         raise HTTPException(status_code=500, detail=f"PubMed search failed: {str(e)}")
 
 
-def _parse_pubmed_xml(xml_data: str) -> List[PubMedArticle]:
-    """Parse PubMed XML response"""
+async def _ncbi_request(method: str, endpoint: str, params: dict) -> httpx.Response:
+    """Rate-limited E-utilities request"""
+    if NCBI_API_KEY:
+        params = {**params, "api_key": NCBI_API_KEY}
+
+    await ncbi_rate_limiter.acquire()
+    if method == "GET":
+        response = await http_client.get(f"{base_url}/{endpoint}", params=params)
+    else:
+        response = await http_client.post(f"{base_url}/{endpoint}", data=params)
+    response.raise_for_status()
+    return response
+
+
+async def _esearch(query: str, max_results: int, sort: str, date_range: Optional[str],
+                   use_history: bool) -> dict:
+    """Search for PMIDs, optionally storing the result set on the history server"""
+    search_params = {
+        "db": "pubmed",
+        "term": query,
+        "retmax": max_results,
+        "retmode": "json",
+        "sort": sort
+    }
+
+    if date_range:
+        search_params["datetype"] = "pdat"
+        search_params["reldate"] = date_range
+
+    if use_history:
+        search_params["usehistory"] = "y"
+
+    search_response = await _ncbi_request("GET", "esearch.fcgi", search_params)
+    return search_response.json().get("esearchresult", {})
+
+
+async def _efetch(fetch_params: dict) -> List[PubMedArticle]:
+    """POST one efetch request and parse the XML as it streams in"""
+    if NCBI_API_KEY:
+        fetch_params = {**fetch_params, "api_key": NCBI_API_KEY}
+
+    fetch_params = {"db": "pubmed", "retmode": "xml", "rettype": "abstract", **fetch_params}
+    parser = PubMedXMLStreamParser()
     articles = []
-    try:
-        root = ET.fromstring(xml_data)
 
-        for article_elem in root.findall(".//PubmedArticle"):
+    await ncbi_rate_limiter.acquire()
+    async with http_client.stream("POST", f"{base_url}/efetch.fcgi", data=fetch_params) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            articles.extend(parser.feed(chunk))
+
+    articles.extend(parser.close())
+    return articles
+
+
+async def _fetch_chunks(chunk_params: List[dict], produced: bool = False) -> AsyncIterator[List[PubMedArticle]]:
+    """
+    Run efetch chunks concurrently under the rate limiter, yielding each chunk's articles as it completes. Failed
+    chunks are logged and skipped. The last error is raised only when nothing was produced at all, neither by a chunk
+    nor by the caller beforehand (`produced`, e.g. articles served from the store).
+    """
+    tasks = [asyncio.create_task(_efetch(params)) for params in chunk_params]
+    failed = 0
+    error = None
+    try:
+        for task in asyncio.as_completed(tasks):
             try:
-                # Extract PMID
-                pmid_elem = article_elem.find(".//PMID")
-                pmid = pmid_elem.text if pmid_elem is not None else ""
-
-                # Extract title
-                title_elem = article_elem.find(".//ArticleTitle")
-                title = title_elem.text if title_elem is not None else "No title available"
-
-                # Extract authors
-                authors = []
-                author_list = article_elem.find(".//AuthorList")
-                if author_list is not None:
-                    for author in author_list.findall(".//Author"):
-                        last_name = author.find("LastName")
-                        first_name = author.find("ForeName")
-                        if last_name is not None:
-                            name = last_name.text
-                            if first_name is not None:
-                                name += f", {first_name.text}"
-                            authors.append(name)
-
-                # Extract abstract
-                abstract_elem = article_elem.find(".//Abstract/AbstractText")
-                abstract = abstract_elem.text if abstract_elem is not None else "No abstract available"
-
-                # Extract DOI
-                doi = None
-                for article_id in article_elem.findall(".//ArticleId"):
-                    if article_id.get("IdType") == "doi":
-                        doi = article_id.text
-                        break
-
-                # Extract publication date
-                pub_date = None
-                pub_date_elem = article_elem.find(".//PubDate")
-                if pub_date_elem is not None:
-                    year = pub_date_elem.find("Year")
-                    month = pub_date_elem.find("Month")
-                    if year is not None:
-                        pub_date = year.text
-                        if month is not None:
-                            pub_date += f"-{month.text}"
-
-                # Extract journal
-                journal_elem = article_elem.find(".//Journal/Title")
-                journal = journal_elem.text if journal_elem is not None else None
-
-                article = PubMedArticle(
-                    pmid=pmid,
-                    title=title,
-                    authors=authors,
-                    abstract=abstract,
-                    doi=doi,
-                    publication_date=pub_date,
-                    journal=journal,
-                    url=f"https://pubmed.ncbi.nlm.nih.gov/{pmid}"
-                )
-                articles.append(article)
+                batch = await task
+            except (httpx.HTTPError, ET.ParseError) as e:
+                # Keep the chunks that did arrive rather than failing the whole search
+                logger.warning(f"PubMed efetch chunk failed: {type(e).__name__}: {e}")
+                failed += 1
+                error = e
+                continue
+
+            produced = True
+            yield batch
+
+        if error is not None:
+            if not produced:
+                raise error
+            logger.warning(f"{failed} of {len(chunk_params)} PubMed efetch chunks failed, returning partial results")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _stream_pubmed_articles(pmids: List[str], search_result: dict) -> AsyncIterator[List[PubMedArticle]]:
+    """
+    Stream parsed articles for an esearch result back batch by batch. PMIDs already in the article store are served
+    locally, the rest are fetched EFETCH_BATCH_SIZE at a time, through the history server (WebEnv/query_key) when
+    nothing was cached and esearch stored the result set there.
+    """
+    cached = await _load_cached_articles(pmids)
+    if cached:
+        yield cached
+
+    cached_pmids = {article.pmid for article in cached}
+    missing = [pmid for pmid in pmids if pmid not in cached_pmids]
+    if not missing:
+        return
+
+    if not cached and "webenv" in search_result:
+        total = len(pmids)
+        chunk_params = [
+            {
+                "WebEnv": search_result["webenv"],
+                "query_key": search_result["querykey"],
+                "retstart": retstart,
+                "retmax": min(EFETCH_BATCH_SIZE, total - retstart),
+            }
+            for retstart in range(0, total, EFETCH_BATCH_SIZE)
+        ]
+    else:
+        chunk_params = [
+            {"id": ",".join(missing[i:i + EFETCH_BATCH_SIZE])}
+            for i in range(0, len(missing), EFETCH_BATCH_SIZE)
+        ]
+
+    async for batch in _fetch_chunks(chunk_params, produced=bool(cached)):
+        await _store_articles(batch)
+        yield batch
+
+
+async def _load_cached_articles(pmids: List[str]) -> List[PubMedArticle]:
+    if article_store is None:
+        return []
+
+    try:
+        found = await asyncio.to_thread(article_store.get_many, pmids)
+    except sqlite3.Error as e:
+        logger.warning(f"PubMed article store read failed: {e}")
+        return []
+
+    return [PubMedArticle(**found[pmid]) for pmid in pmids if pmid in found]
+
+
+async def _store_articles(articles: List[PubMedArticle]):
+    articles = [article for article in articles if article.title != NO_TITLE and article.abstract != NO_ABSTRACT]
+    if article_store is None or not articles:
+        return
+
+    try:
+        await asyncio.to_thread(article_store.put_many, {article.pmid: article.model_dump() for article in articles})
+    except sqlite3.Error as e:
+        logger.warning(f"PubMed article store write failed: {e}")
+
+
+@mcp_server.custom_route("/stats", methods=["GET"])
+async def stats(request: Request) -> JSONResponse:
+    store_stats = await asyncio.to_thread(article_store.stats) if article_store is not None else None
+    return JSONResponse({"article_store": store_stats})
+
+
+def _text(elem: Optional[ET.Element], path: str) -> Optional[str]:
+    """Text of the direct-path child at path, or None if it is missing"""
+    if elem is None:
+        return None
+    child = elem.find(path)
+    return child.text if child is not None else None
+
+
+def _parse_article(article_elem: ET.Element) -> PubMedArticle:
+    """Build a PubMedArticle from one closed PubmedArticle element using direct child paths only"""
+    citation = article_elem.find("MedlineCitation")
+    article = citation.find("Article") if citation is not None else None
+    journal = article.find("Journal") if article is not None else None
+
+    # Extract PMID
+    pmid = _text(citation, "PMID") or ""
+
+    # Extract title
+    title = _text(article, "ArticleTitle") or NO_TITLE
+
+    # Extract authors
+    authors = []
+    author_list = article.find("AuthorList") if article is not None else None
+    if author_list is not None:
+        for author in author_list.iterfind("Author"):
+            last_name = author.findtext("LastName")
+            first_name = author.findtext("ForeName")
+            if last_name is not None:
+                authors.append(f"{last_name}, {first_name}" if first_name is not None else last_name)
+
+    # Extract abstract
+    abstract = _text(article, "Abstract/AbstractText") or NO_ABSTRACT
+
+    # Extract DOI
+    doi = None
+    for article_id in article_elem.iterfind("PubmedData/ArticleIdList/ArticleId"):
+        if article_id.get("IdType") == "doi":
+            doi = article_id.text
+            break
+
+    # Extract publication date
+    pub_date = None
+    pub_date_elem = journal.find("JournalIssue/PubDate") if journal is not None else None
+    if pub_date_elem is not None:
+        year = pub_date_elem.findtext("Year")
+        month = pub_date_elem.findtext("Month")
+        if year is not None:
+            pub_date = f"{year}-{month}" if month is not None else year
+
+    # Extract journal
+    journal_title = _text(journal, "Title")
+
+    return PubMedArticle(
+        pmid=pmid,
+        title=title,
+        authors=authors,
+        abstract=abstract,
+        doi=doi,
+        publication_date=pub_date,
+        journal=journal_title,
+        url=f"https://pubmed.ncbi.nlm.nih.gov/{pmid}"
+    )
+
+
+class PubMedXMLStreamParser:
+    """
+    Incremental efetch XML parser. Feed it response chunks as they arrive and it returns each PubMedArticle as soon
+    as its PubmedArticle element closes, then clears the element so memory stays flat regardless of result count.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("end",))
+
+    def _drain(self) -> List[PubMedArticle]:
+        articles = []
+        for _, elem in self._parser.read_events():
+            if elem.tag != "PubmedArticle":
+                continue
 
+            try:
+                articles.append(_parse_article(elem))
             except Exception as e:
                 logger.warning(f"Failed to parse article: {e}")
-                continue
 
+            # Release the processed subtree, only an empty shell stays attached to the root
+            elem.clear()
+
+        return articles
+
+    def feed(self, chunk: Union[str, bytes]) -> List[PubMedArticle]:
+        self._parser.feed(chunk)
+        return self._drain()
+
+    def close(self) -> List[PubMedArticle]:
+        self._parser.close()
+        return self._drain()
+
+
+def _iter_pubmed_xml(chunks: Iterable[Union[str, bytes]]) -> Iterator[PubMedArticle]:
+    """Yield articles from an iterable of XML chunks, stopping at the first malformed chunk"""
+    parser = PubMedXMLStreamParser()
+    try:
+        for chunk in chunks:
+            yield from parser.feed(chunk)
+        yield from parser.close()
     except ET.ParseError as e:
         logger.error(f"XML parsing error: {e}")
 
-    return articles
+
+def _parse_pubmed_xml(xml_data: str) -> List[PubMedArticle]:
+    """Parse PubMed XML response"""
+    # Feed an in-memory document in slices so processed articles are freed before the rest is parsed
+    chunks = (xml_data[i:i + XML_CHUNK_SIZE] for i in range(0, len(xml_data), XML_CHUNK_SIZE))
+    return list(_iter_pubmed_xml(chunks))
 
 
 if __name__ == "__main__":
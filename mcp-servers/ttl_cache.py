@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Sentinel so cached falsy values (empty result lists) still count as hits
+MISSING = object()
+
+
+def normalize_query(text: str) -> str:
+    """Fold case and whitespace so "Chest  Pain" and "chest pain" share a cache entry."""
+    return " ".join(text.casefold().split())
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after `ttl` seconds (None disables expiry)."""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+
+        # Counters exposed through stats()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = MISSING):
+        ttl = self.ttl if ttl is MISSING else ttl
+        self._entries[key] = (time.monotonic() + ttl if ttl is not None else None, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+        }
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight task whose result every caller shares."""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(func())
+        self._in_flight[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, done: asyncio.Future):
+        # Only drop the entry if a newer flight has not already replaced it
+        if self._in_flight.get(key) is done:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+
+async def cached_call(cache: TTLCache, flight: SingleFlight, key: Hashable, func: Callable[[], Awaitable[Any]],
+                      cache_if: Callable[[Any], bool] = lambda value: True) -> Any:
+    """Serve `key` from cache, otherwise run `func` once for all concurrent callers and cache accepted results."""
+    value = cache.get(key)
+    if value is not MISSING:
+        return value
+
+    async def load():
+        result = await func()
+        if cache_if(result):
+            cache.set(key, result)
+        return result
+
+    return await flight.do(key, load)
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from time import time
+from llm_stream import STREAM_OPTIONS, StreamedCompletion
+
+logger = logging.getLogger(__name__)
+
+
+# Tool rounds per query before the model is made to answer without tools
+MAX_TOOL_ROUNDS = 4
+
+# Seconds each tool call may take before its result is reported as timed out
+TOOL_CALL_TIMEOUT = 60
+
+
+@dataclass
+class RoundTiming:
+    round: int
+    ttft: float | None = None
+    model_seconds: float = 0.0
+    tool_seconds: float = 0.0
+    tools: list = field(default_factory=list)
+
+
+# Text handed back to the model for one tool call, failures and timeouts included
+def tool_result_text(tool, result, timeout: float | None = TOOL_CALL_TIMEOUT):
+    if isinstance(result, asyncio.TimeoutError):
+        return f'Tool {tool.function.name} timed out after {timeout} seconds.'
+    if isinstance(result, Exception):
+        return f'Tool {tool.function.name} failed: {type(result).__name__}: {result}'
+    return '\n'.join(getattr(content, 'text', str(content)) for content in result.content)
+
+
+# One line per round for footers and logs
+def format_rounds(rounds):
+    parts = []
+    for timing in rounds:
+        part = f'R{timing.round} model {timing.model_seconds:.2f} s'
+        if timing.tools:
+            part += f' + tools {timing.tool_seconds:.2f} s ({", ".join(timing.tools)})'
+        parts.append(part)
+    return ', '.join(parts)
+
+
+class AgentLoop:
+    """
+    Multi-round tool-calling loop shared by the Streamlit and terminal front-ends.
+
+    Each round requests a completion with the tool catalog; if the model asks for tools, every call in the round is
+    dispatched concurrently through the MCP session, and the assistant's tool-call message plus one tool message per
+    call (matched by tool_call_id) are appended to `messages` before the next round. After `max_rounds` tool rounds
+    the model is asked once more without tools so it has to answer. Text is yielded as it arrives (streamed or not),
+    and per-round timings are collected in `rounds`.
+
+    Use iter_text with a synchronous OpenAI client and aiter_text with an AsyncOpenAI client.
+    """
+
+    def __init__(self, session, max_rounds: int = MAX_TOOL_ROUNDS, tool_timeout: float | None = TOOL_CALL_TIMEOUT,
+                 on_tool_calls=None):
+        self.session = session
+        self.max_rounds = max_rounds
+        self.tool_timeout = tool_timeout
+        self.on_tool_calls = on_tool_calls
+
+        self.start_time = None
+        self.completion = None
+        self.rounds = []
+
+        # Tools sent with the latest request, None once the model has to answer without them
+        self.request_tools = None
+
+    @property
+    def ttft(self):
+        return self.rounds[0].ttft if self.rounds else None
+
+    @property
+    def content(self):
+        return self.completion.content if self.completion is not None else ''
+
+    def _start(self, start_time):
+        self.start_time = start_time if start_time is not None else time()
+        self.completion = None
+        self.rounds = []
+
+    def _request(self, messages, tools, round_number, stream, kwargs):
+        request = {**kwargs, 'messages': messages}
+        if tools and round_number <= self.max_rounds:
+            request['tools'] = tools
+        self.request_tools = request.get('tools')
+        if stream:
+            request.update(stream=True, stream_options=STREAM_OPTIONS)
+        return request
+
+    def _begin_round(self, round_number):
+        round_start = time()
+        self.completion = StreamedCompletion(self.start_time if round_number == 1 else round_start)
+        self.rounds.append(RoundTiming(round_number))
+        return round_start
+
+    def _end_round(self, round_start):
+        timing = self.rounds[-1]
+        timing.ttft = self.completion.ttft
+        timing.model_seconds = time() - round_start
+
+        tool_calls = self.completion.tool_calls
+        if not tool_calls:
+            return None
+        if timing.round > self.max_rounds:
+            logger.warning(f'Ignoring tool calls after the {self.max_rounds} round limit.')
+            return None
+
+        timing.tools = [tool.function.name for tool in tool_calls]
+        if self.on_tool_calls is not None:
+            self.on_tool_calls(tool_calls)
+        return tool_calls
+
+    def _record_results(self, messages, tool_calls, results, tool_start):
+        self.rounds[-1].tool_seconds = time() - tool_start
+        messages.append(self.completion.message())
+        for tool, result in zip(tool_calls, results):
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool.id,
+                "content": tool_result_text(tool, result, self.tool_timeout),
+            })
+
+    @staticmethod
+    def _calls(tool_calls):
+        return [(tool.function.name, tool.function.arguments) for tool in tool_calls]
+
+    def iter_text(self, client, messages, tools=None, stream: bool = True, start_time: float | None = None,
+                  **kwargs):
+        """Run the loop with a synchronous client, yielding response text across all rounds"""
+        self._start(start_time)
+        separator = ''
+
+        for round_number in range(1, self.max_rounds + 2):
+            round_start = self._begin_round(round_number)
+            response = client.chat.completions.create(**self._request(messages, tools, round_number, stream, kwargs))
+
+            for text in self.completion.iter_text(response) if stream else [self.completion.load(response)]:
+                if text:
+                    yield separator + text
+                    separator = ''
+
+            tool_calls = self._end_round(round_start)
+            if tool_calls is None:
+                return
+
+            tool_start = time()
+            results = self.session.call_tools(self._calls(tool_calls), timeout=self.tool_timeout)
+            self._record_results(messages, tool_calls, results, tool_start)
+            separator = '\n\n' if self.completion.content else separator
+
+    async def aiter_text(self, client, messages, tools=None, stream: bool = True, start_time: float | None = None,
+                         **kwargs):
+        """Run the loop with an async client, yielding response text across all rounds"""
+        self._start(start_time)
+        separator = ''
+
+        for round_number in range(1, self.max_rounds + 2):
+            round_start = self._begin_round(round_number)
+            response = await client.chat.completions.create(
+                **self._request(messages, tools, round_number, stream, kwargs)
+            )
+
+            if stream:
+                async for text in self.completion.aiter_text(response):
+                    yield separator + text
+                    separator = ''
+            elif text := self.completion.load(response):
+                yield separator + text
+                separator = ''
+
+            tool_calls = self._end_round(round_start)
+            if tool_calls is None:
+                return
+
+            tool_start = time()
+            results = await self.session.acall_tools(self._calls(tool_calls), timeout=self.tool_timeout)
+            self._record_results(messages, tool_calls, results, tool_start)
+            separator = '\n\n' if self.completion.content else separator
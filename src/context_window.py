@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+# Prompt tokens the conversation history may use, leaving the rest of the model's window for the response
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 12000))
+
+# Most recent completed turns kept verbatim, older tool outputs are trimmed to TOOL_OUTPUT_KEEP_CHARS
+KEEP_RECENT_TURNS = 2
+TOOL_OUTPUT_KEEP_CHARS = 600
+
+# Gemma 3 vision encodes every image as 256 soft tokens, plus per-message chat template overhead
+IMAGE_TOKENS = 256
+MESSAGE_OVERHEAD_TOKENS = 4
+CHARS_PER_TOKEN = 4.0
+
+# Dropped turns kept in the summary, and the characters of each side of a turn they quote
+SUMMARY_MAX_TURNS = 10
+SUMMARY_QUERY_CHARS = 200
+SUMMARY_ANSWER_CHARS = 300
+
+IMAGE_PLACEHOLDER = '[Image shared earlier in the conversation, already answered]'
+SUMMARY_HEADER = '\n\nSummary of earlier conversation:\n'
+
+
+# Text of a message's content, whether a string or a list of content parts
+def message_text(message):
+    content = message.get('content') or ''
+    if isinstance(content, str):
+        return content
+    return ' '.join(part.get('text', '') for part in content if part.get('type') == 'text')
+
+
+def _is_image_part(part):
+    return part.get('type') == 'image_url'
+
+
+class ContextWindow:
+    """
+    Keeps a chat history within a prompt token budget by editing it in place before each request.
+
+    The history is split into turns, each ending with an assistant answer (an assistant message without tool calls),
+    so a turn's tool-call and tool messages always stay together; messages after the last answer form the open turn
+    and are never touched. Pruning is applied cheapest first:
+        1. images in answered turns become a text placeholder
+        2. tool outputs older than `keep_recent_turns` are trimmed
+        3. while still over budget, the oldest turns are dropped and summarised into the system message
+
+    Token counts are estimates (characters / CHARS_PER_TOKEN, IMAGE_TOKENS per image) scaled by observe(), which
+    calibrates them against the prompt_tokens the server reports.
+    """
+
+    def __init__(self, budget: int = CONTEXT_TOKEN_BUDGET, keep_recent_turns: int = KEEP_RECENT_TURNS):
+        self.budget = budget
+        self.keep_recent_turns = keep_recent_turns
+        self.scale = 1.0
+
+        # Counters exposed through stats()
+        self.last_pruned_tokens = 0
+        self.pruned_tokens = 0
+        self.dropped_turns = 0
+
+    # --- Token accounting ------------------------------------------------------------------------------------------
+
+    def _estimate(self, message):
+        content = message.get('content') or ''
+        if isinstance(content, str):
+            arguments = sum(len(call['function']['arguments']) for call in message.get('tool_calls') or [])
+            return (len(content) + arguments) / CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+        tokens = MESSAGE_OVERHEAD_TOKENS
+        for part in content:
+            tokens += IMAGE_TOKENS if _is_image_part(part) else len(part.get('text', '')) / CHARS_PER_TOKEN
+        return tokens
+
+    def count_tokens(self, message):
+        return int(self._estimate(message) * self.scale)
+
+    def total_tokens(self, messages):
+        return sum(self.count_tokens(message) for message in messages)
+
+    @staticmethod
+    def tool_schema_tokens(tools):
+        """Estimated prompt tokens of the tool schemas sent alongside the messages"""
+        return len(json.dumps(tools)) / CHARS_PER_TOKEN if tools else 0
+
+    def observe(self, messages, prompt_tokens, tools=None):
+        """
+        Calibrate estimates against the prompt_tokens reported for a request made with `messages` and `tools`. The
+        tool schemas count towards prompt_tokens but not towards the budget, so their estimate is subtracted first.
+        """
+        estimate = sum(self._estimate(message) for message in messages)
+        prompt_tokens = (prompt_tokens or 0) - self.tool_schema_tokens(tools)
+        if estimate and prompt_tokens > 0:
+            # Smooth so one tool-heavy request does not swing the scale
+            self.scale = 0.7 * self.scale + 0.3 * (prompt_tokens / estimate)
+
+    # --- Pruning ---------------------------------------------------------------------------------------------------
+
+    @staticmethod
+    def _turns(messages, start):
+        """(first, last) index pairs of the answered turns"""
+        turns = []
+        first = start
+        for index in range(start, len(messages)):
+            if messages[index].get('role') == 'assistant' and not messages[index].get('tool_calls'):
+                turns.append((first, index))
+                first = index + 1
+        return turns
+
+    def _replace_images(self, messages, turns):
+        for first, last in turns:
+            for message in messages[first:last]:
+                content = message.get('content')
+                if isinstance(content, list) and any(_is_image_part(part) for part in content):
+                    message['content'] = [
+                        {'type': 'text', 'text': IMAGE_PLACEHOLDER} if _is_image_part(part) else part
+                        for part in content
+                    ]
+
+    def _trim_tool_outputs(self, messages, turns):
+        for first, last in turns[:max(len(turns) - self.keep_recent_turns, 0)]:
+            for message in messages[first + 1:last]:
+                content = message.get('content')
+                if message.get('role') == 'tool' and isinstance(content, str) and len(content) > TOOL_OUTPUT_KEEP_CHARS:
+                    trimmed = len(content) - TOOL_OUTPUT_KEEP_CHARS
+                    message['content'] = (f'{content[:TOOL_OUTPUT_KEEP_CHARS]}... '
+                                          f'[{trimmed} characters of tool output trimmed]')
+
+    @staticmethod
+    def _summarise(messages, first, last):
+        query = message_text(messages[first]).replace(IMAGE_PLACEHOLDER, '[image]')
+        query = ' '.join(query.split())[:SUMMARY_QUERY_CHARS]
+        answer = ' '.join(message_text(messages[last]).split())[:SUMMARY_ANSWER_CHARS]
+        return f'- User: {query}\n  Assistant: {answer}'
+
+    @staticmethod
+    def _add_summary(messages, entries):
+        if messages and messages[0].get('role') == 'system':
+            base, _, summary = messages[0]['content'].partition(SUMMARY_HEADER)
+        else:
+            messages.insert(0, {'role': 'system', 'content': ''})
+            base, summary = '', ''
+
+        # Every summarised turn is two lines
+        lines = (summary.splitlines() if summary else []) + '\n'.join(entries).splitlines()
+        messages[0]['content'] = base + SUMMARY_HEADER + '\n'.join(lines[-SUMMARY_MAX_TURNS * 2:])
+
+    def prepare(self, messages):
+        """Prune `messages` in place to fit the budget, returning the number of tokens removed"""
+        before = self.total_tokens(messages)
+        start = 1 if messages and messages[0].get('role') == 'system' else 0
+
+        turns = self._turns(messages, start)
+        self._replace_images(messages, turns)
+        self._trim_tool_outputs(messages, turns)
+
+        # Drop whole turns, oldest first, but never the open one
+        total = self.total_tokens(messages)
+        dropped = 0
+        while dropped < len(turns) and total > self.budget:
+            first, last = turns[dropped]
+            total -= self.total_tokens(messages[first:last + 1])
+            dropped += 1
+
+        if dropped:
+            entries = [self._summarise(messages, first, last) for first, last in turns[:dropped]]
+            del messages[start:turns[dropped - 1][1] + 1]
+            self._add_summary(messages, entries)
+            self.dropped_turns += dropped
+            logger.info(f'Dropped {dropped} turns from the context window.')
+
+        self.last_pruned_tokens = max(before - self.total_tokens(messages), 0)
+        self.pruned_tokens += self.last_pruned_tokens
+        return self.last_pruned_tokens
+
+    def stats(self):
+        return {
+            'budget': self.budget,
+            'scale': self.scale,
+            'last_pruned_tokens': self.last_pruned_tokens,
+            'pruned_tokens': self.pruned_tokens,
+            'dropped_turns': self.dropped_turns,
+        }
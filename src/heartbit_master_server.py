@@ -0,0 +1,78 @@
+import logging
+from typing import Optional
+from mcp_master import MasterMCPServer
+from mcp_master.master_server.master_server_client import MasterServerClient, TOOL_NAME_ORIGIN_SEPARATOR
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from heartbit_orchestration import HeartbitOrchestration
+from tool_result_cache import ToolResultCache
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------------------------------------------------------------------------------
+# Master Server Client -----------------------------------------------------------------------
+# --------------------------------------------------------------------------------------------
+
+
+class CachingMasterServerClient(MasterServerClient):
+    """MasterServerClient whose sub-server tool calls go through a ToolResultCache"""
+
+    def __init__(self, app, tool_cache: ToolResultCache):
+        super().__init__(app)
+        self.tool_cache = tool_cache
+
+    async def get_available_tools(self, server_filename: str):
+        await super().get_available_tools(server_filename)
+        self.tool_cache.register_tools(self.available_tools.get(server_filename, []))
+
+    async def call_tool(self, tool_name: str, tool_args: Optional[dict]):
+        name, _ = tool_name.split(TOOL_NAME_ORIGIN_SEPARATOR)
+        return await self.tool_cache.call(
+            tool_name, name, tool_args, lambda: super(CachingMasterServerClient, self).call_tool(tool_name, tool_args)
+        )
+
+
+# --------------------------------------------------------------------------------------------
+# Master Server ------------------------------------------------------------------------------
+# --------------------------------------------------------------------------------------------
+
+
+class HeartbitMasterMCPServer(MasterMCPServer):
+    """
+    MasterMCPServer with Heartbit's performance layers: sub-server tool results are cached, questions are routed and
+    judged by HeartbitOrchestration, and counters are served as JSON at /stats on the master server's port.
+    """
+
+    def __init__(self, port: int = 3000, sub_servers=None, tool_cache: ToolResultCache | None = None,
+                 orchestration: HeartbitOrchestration | None = None):
+        super().__init__(port=port, sub_servers=sub_servers)
+        self.tool_cache = tool_cache if tool_cache is not None else ToolResultCache()
+
+        # access_sub_mcp runs whichever graph self.orch holds
+        self.orch = orchestration if orchestration is not None else HeartbitOrchestration()
+
+        @self.app.custom_route("/stats", methods=["GET"])
+        async def stats(request: Request) -> JSONResponse:
+            return JSONResponse(self.stats())
+
+    def stats(self):
+        return {
+            "tool_cache": self.tool_cache.stats(),
+            "routing": self.orch.stats(),
+            "judge": self.orch.judge_policy.stats(),
+        }
+
+    # Same as MasterMCPServer.initialize_interserver_comms, with the caching client
+    async def initialize_interserver_comms(self):
+        self.master_server_client = CachingMasterServerClient(self.app, self.tool_cache)
+
+        try:
+            for sub_server in self.sub_servers:
+                await self.master_server_client.connect_to_server(sub_server)
+
+            await self.master_server_client.server_loop()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            await self.master_server_client.cleanup()
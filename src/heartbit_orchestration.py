@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+from time import monotonic
+from langgraph.graph import StateGraph, END
+from mcp.types import TextContent
+from mcp_master.orchestration.agent_protocol import MultiAgentState
+from mcp_master.orchestration.agents import config as agent_config, judge_decision, tools_selector_node
+from judge_policy import JudgePolicy
+from tool_router import RoutingCache, ToolRouter
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbitState(MultiAgentState):
+    """MultiAgentState plus the selector model's latest [(tool name, arguments)], kept until the judge accepts it"""
+    pending_route: list = []
+
+
+# Text content of sub-server results, in the form the judge and access_sub_mcp expect
+def external_data_from(results):
+    external_data = []
+    for result in results:
+        for content in getattr(result, 'content', None) or []:
+            if isinstance(content, TextContent):
+                external_data.append(content.text)
+    return external_data
+
+
+class HeartbitOrchestration:
+    """
+    Drop-in replacement for mcp_master's Orchestration graph (tools_selector_node -> judge_node, retried on BAD).
+
+    The selector node first tries to avoid the selector model: an exact repeat of a question replays the tool calls
+    the model chose last time (RoutingCache), and otherwise the ToolRouter answers when it is confident. Only
+    ambiguous questions, and every retry after a BAD judgement, reach the model. The model's decision waits in
+    `pending_route` and only feeds both once the judge accepts the answer (commit_route), so rejected tool choices are
+    never replayed or learned. Routing counters, including the selector-node time saved by bypasses, are reported by
+    stats().
+
+    The judge node is a JudgePolicy, which validates, samples or defers judgements instead of calling the judge model
+    for every answer. Answers rejected by a deferred judgement are no longer replayed from the routing cache, and
+    answers that were never judged are not learned from.
+    """
+
+    def __init__(self, router: ToolRouter | None = None, routing_cache: RoutingCache | None = None,
+                 judge_policy: JudgePolicy | None = None):
+        self.router = router if router is not None else ToolRouter()
+        self.routing_cache = routing_cache if routing_cache is not None else RoutingCache()
+        self.judge_policy = judge_policy if judge_policy is not None else JudgePolicy()
+        if self.judge_policy.on_rejected is None:
+            self.judge_policy.on_rejected = self.routing_cache.invalidate
+        if self.judge_policy.on_accepted is None:
+            self.judge_policy.on_accepted = self.commit_route
+
+        # Counters exposed through stats()
+        self.model_routes = 0
+        self.cache_routes = 0
+        self.router_routes = 0
+        self.retries = 0
+        self.model_seconds = 0.0
+        self.bypass_seconds = 0.0
+
+        self.orch = StateGraph(HeartbitState)
+        self.orch.add_node("tools_selector_node", self.tools_selector_node)
+        self.orch.add_node("judge_node", self.judge_node)
+
+        self.orch.set_entry_point("tools_selector_node")
+        self.orch.add_edge("tools_selector_node", "judge_node")
+        self.orch.add_conditional_edges(
+            "judge_node",
+            judge_decision,
+            {
+                'GOOD': END,
+                'BAD': 'tools_selector_node'
+            }
+        )
+
+        self.graph = self.orch.compile()
+
+    async def tools_selector_node(self, state: HeartbitState):
+        start = monotonic()
+
+        # Retries carry the judge's feedback for the model, and the replayed decision was judged BAD
+        if state.qa_feedback:
+            self.retries += 1
+            self.routing_cache.invalidate(state.question)
+            result = await tools_selector_node(state)
+            return {**result, 'pending_route': self._decision(result.get('tools_requested'))}
+
+        calls = self.routing_cache.get(state.question)
+        if calls is not None:
+            self.cache_routes += 1
+        else:
+            calls = self.router.route(state.question, agent_config.tools)
+            if calls is not None:
+                self.router_routes += 1
+
+        if calls is not None:
+            result = await self._call_tools(state, calls)
+            self.bypass_seconds += monotonic() - start
+            return result
+
+        result = await tools_selector_node(state)
+        self.model_routes += 1
+        self.model_seconds += monotonic() - start
+        return {**result, 'pending_route': self._decision(result.get('tools_requested'))}
+
+    # LangGraph builds each node's state from its annotation, this keeps pending_route for the policy's on_accepted
+    async def judge_node(self, state: HeartbitState):
+        return await self.judge_policy.judge_node(state)
+
+    async def _call_tools(self, state, calls):
+        results = await asyncio.gather(
+            *(agent_config.master_server_client.call_tool(name, arguments) for name, arguments in calls)
+        )
+        external_data = external_data_from(results)
+
+        # Same history the selector model would have left, so a BAD judgement can retry through the model
+        state.messages = [
+            {"role": "system", "content": agent_config.dispatcher_system_message},
+            {"role": "user", "content": state.question},
+            {"role": "assistant", "content": str(external_data)},
+        ]
+
+        logger.info(f'Routed without the selector model to {[name for name, _ in calls]}.')
+        return {
+            'tools_requested': [{'name': name, 'arguments': arguments} for name, arguments in calls],
+            'external_data': external_data,
+            'messages': state.messages,
+            'pending_route': [],
+        }
+
+    # [(tool name, arguments)] of the selector model's tool calls, empty when there is nothing to learn
+    @staticmethod
+    def _decision(tool_calls):
+        try:
+            return [(tool.function.name, json.loads(tool.function.arguments or '{}')) for tool in tool_calls or []]
+        except (AttributeError, ValueError):
+            return []
+
+    def commit_route(self, state: HeartbitState):
+        """Cache and learn the pending selector decision once the judge has accepted its answer"""
+        if not state.pending_route:
+            return
+
+        self.routing_cache.set(state.question, state.pending_route)
+        self.router.learn(state.question, [name for name, _ in state.pending_route])
+
+    def stats(self):
+        bypasses = self.cache_routes + self.router_routes
+        routes = bypasses + self.model_routes
+        model_ms = self.model_seconds / self.model_routes * 1000 if self.model_routes else 0.0
+        bypass_ms = self.bypass_seconds / bypasses * 1000 if bypasses else 0.0
+        return {
+            'routes': routes,
+            'model_routes': self.model_routes,
+            'cache_routes': self.cache_routes,
+            'router_routes': self.router_routes,
+            'judge_retries': self.retries,
+            'bypass_rate': bypasses / routes if routes else 0.0,
+            'average_model_route_ms': model_ms,
+            'average_bypass_route_ms': bypass_ms,
+            'estimated_saved_ms': max(model_ms - bypass_ms, 0.0) * bypasses if self.model_routes else 0.0,
+            'router_examples': self.router.examples,
+            'routing_cache': self.routing_cache.stats(),
+        }
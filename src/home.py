@@ -1,11 +1,16 @@
+import os
 import streamlit as st
-import io
 from time import time
-import asyncio
 from util import *
 from openai import OpenAI
-from fastmcp import Client
-from base64 import b64encode
+from mcp_session import MCPSessionManager
+from tool_catalog import ToolCatalog
+from llm_stream import format_usage
+from agent_loop import AgentLoop, format_rounds
+from context_window import ContextWindow
+from image_pipeline import image_pipeline
+from transcription import transcription_client
+from semantic_cache import SEMANTIC_CACHE_ENABLED, SemanticCache, cacheable_prompt
 
 
 # --------------------------------------------------------------------------------------------
@@ -17,11 +22,7 @@ aoss_host = read_aoss_config(".aoss_config.txt", "AOSS_host_name")
 aoss_index = read_aoss_config(".aoss_config.txt", "AOSS_index_name")
 
 # Variables and constants
-input_file_path = os.path.normpath(os.path.join(os.path.dirname(__file__), "../input-files"))
 image_extensions = [".jpg", ".jpeg", ".png", ".webp"]
-input_image_file = "input_image"
-query_audio_file = "query_audio.wav"
-last_uploaded_files = None
 
 # os.environ["OPENAI_API_KEY"] = os.getenv('bedrock_api_token') #"EMPTY"
 # os.environ["OPENAI_BASE_URL"] = os.getenv('bedrock_api_url') #"http://mcp1.cavatar.info:8081/v1"
@@ -30,6 +31,7 @@ os.environ["OPENAI_API_KEY"] = "EMPTY"
 os.environ["OPENAI_BASE_URL"] = "http://mcp1.cavatar.info:8081/v1"
 MODEL_ID = "alfredcs/torchrun-medgemma-27b-grpo-merged"
 voice_prompt = ''
+voice_transcript = None
 SYSTEM_PROMPT = '''
     You are a trained medical and first aid assistant. Answer the user's question carefully, taking 
     into account each part of their request and making sure to account for any panic or danger they 
@@ -61,54 +63,53 @@ with st.sidebar:
     # File upload box
     upload_file = st.file_uploader("Upload your images here:", accept_multiple_files=True, type=["jpg", "jpeg", "png", "webp"])
 
-    # Only update input file directory if something has changed
-    if upload_file != last_uploaded_files:
-        # File saving
-        image_file_indexes = []
-
-        # Clear input file directory
-        empty_directory(input_file_path)
-
-        # Save file type indexes
-        if upload_file is not None:
-            for i in range(len(upload_file)):
-                _, upload_file_extension = os.path.splitext(upload_file[i].name)
-                if upload_file_extension in image_extensions:
-                    image_file_indexes.append(i)
-
-        # Read file indexes and save accordingly
-        # Image upload
-        for i in range(len(image_file_indexes)):
-            index = image_file_indexes[i]
-            image_bytes = upload_file[index].read()
-            st.image(io.BytesIO(image_bytes))
-
-            input_file = os.path.join(input_file_path, input_image_file + f"_{i}" + upload_file_extension)
-            with open(input_file, 'wb') as image_file:
-                image_file.write(image_bytes)
-
-        last_uploaded_files = upload_file
-
-        # Configuration sliders
-        max_tokens = st.number_input("Maximum Output Tokens", min_value=0, value=4096, max_value=4096, step=64)
-
-        # --- Audio query -----#
-        st.divider()
-        st.header(':green[Enable voice input]')
-        record_audio_bytes = st.audio_input("Toggle mic to start/stop recording")
-        if record_audio_bytes:
-            with open(query_audio_file, 'wb') as audio_file:
-                audio_file.write(record_audio_bytes.getvalue())
-            if os.path.exists(query_audio_file):
-                voice_prompt = get_transcription(query_audio_file).encode('utf-8').decode('unicode_escape')
-
-        # ---- Clear chat history ----
-        st.divider()
-        if st.button("Clear Chat History"):
-            st.session_state.messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-            st.session_state.displayed_messages = [{"role": "assistant", "content": DISPLAYED_PROMPT}]
-            record_audio_bytes = None
-            voice_prompt = ""
+    # Keep this session's uploads in memory, keyed by content hash, reading and encoding only new files
+    if "uploaded_images" not in st.session_state:
+        st.session_state.uploaded_images = {}
+        st.session_state.upload_hashes = {}
+
+    uploaded_images = {}
+    upload_hashes = {}
+    for uploaded in upload_file or []:
+        _, upload_file_extension = os.path.splitext(uploaded.name)
+        if upload_file_extension.lower() not in image_extensions:
+            continue
+
+        content_hash = st.session_state.upload_hashes.get(uploaded.file_id)
+        if content_hash is None:
+            image_bytes = uploaded.getvalue()
+            content_hash = image_pipeline.content_hash(image_bytes)
+            if content_hash not in st.session_state.uploaded_images:
+                st.session_state.uploaded_images[content_hash] = image_pipeline.content_part(image_bytes)
+
+        uploaded_images[content_hash] = st.session_state.uploaded_images[content_hash]
+        upload_hashes[uploaded.file_id] = content_hash
+        st.image(uploaded)
+
+    # Removed uploads drop out of session state
+    st.session_state.uploaded_images = uploaded_images
+    st.session_state.upload_hashes = upload_hashes
+
+    # Configuration sliders
+    max_tokens = st.number_input("Maximum Output Tokens", min_value=0, value=4096, max_value=4096, step=64)
+
+    # --- Audio query -----#
+    st.divider()
+    st.header(':green[Enable voice input]')
+    record_audio_bytes = st.audio_input("Toggle mic to start/stop recording")
+    if record_audio_bytes:
+        # Uploaded from memory in a worker thread while the page renders, reruns with the same recording share the
+        # upload or are served from the transcript cache
+        voice_transcript = transcription_client.submit(record_audio_bytes.getvalue(), "query_audio.wav")
+
+    # ---- Clear chat history ----
+    st.divider()
+    if st.button("Clear Chat History"):
+        st.session_state.messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        st.session_state.displayed_messages = [{"role": "assistant", "content": DISPLAYED_PROMPT}]
+        record_audio_bytes = None
+        voice_transcript = None
+        voice_prompt = ""
 
 
 # --------------------------------------------------------------------------------------------
@@ -116,45 +117,28 @@ with st.sidebar:
 # --------------------------------------------------------------------------------------------
 
 
-# Create FastMCP client
-if "mcp_client" not in st.session_state:
-    st.session_state.mcp_client = Client(MCP_URL)
+# Shared MCP session and tool catalog, kept across reruns and browser sessions
+@st.cache_resource
+def get_mcp_session():
+    session = MCPSessionManager(MCP_URL)
+    return session, ToolCatalog(session)
 
 
-# Get tools
-async def get_tools():
-    try:
-        async with st.session_state.mcp_client as mcp_client:
-            tools_list = await mcp_client.list_tools()
+mcp_session, tool_catalog = get_mcp_session()
 
-            return list(map(tool_reformat, tools_list))
-    except RuntimeError:
-        raise RuntimeError('Ensure master_mcp_server.py is running before starting the chatbot.')
 
+# Answer cache shared across browser sessions, None unless SEMANTIC_CACHE_ENABLED is set
+@st.cache_resource
+def get_semantic_cache():
+    return SemanticCache() if SEMANTIC_CACHE_ENABLED else None
 
-# Reformat FastMCP tools to OpenAI standard
-def tool_reformat(tool):
-    return {
-        'type': 'function',
-        'function': {
-            'name': tool.name,
-            'description': tool.description,
-            'parameters': tool.inputSchema,
-        },
-        'strict': True
-    }
 
+semantic_cache = get_semantic_cache()
 
-# Call tool
-async def call_tool(tool):
-    async with st.session_state.mcp_client as mcp_client:
-        # Convert tool arguments from string to dict if necessary
-        if isinstance(tool.function.arguments, str):
-            args = eval(tool.function.arguments)
-        else:
-            args = tool.function.arguments
-        
-        return await mcp_client.call_tool(tool.function.name, args)
+
+# Show which tools the model is calling while the response streams
+def announce_tool_calls(tool_calls):
+    st.toast(f'Calling {", ".join(tool.function.name for tool in tool_calls)}...')
 
 
 # --------------------------------------------------------------------------------------------
@@ -172,10 +156,19 @@ if "messages" not in st.session_state:
 for message in st.session_state.displayed_messages:
     st.chat_message(message["role"]).write(message["content"])
 
+# Per-session context window manager
+if "context_window" not in st.session_state:
+    st.session_state.context_window = ContextWindow()
+
 # OpenAI Client
 if "openai_client" not in st.session_state:
     st.session_state.openai_client = OpenAI()
 
+# Wait for the voice transcript only once the rest of the page is on screen
+if voice_transcript is not None:
+    with st.spinner("Transcribing..."):
+        voice_prompt = voice_transcript.result().encode('utf-8').decode('unicode_escape')
+
 # Prompt input logic
 if prompt := st.chat_input() or len(voice_prompt) > 3:
     prompt_flag = isinstance(prompt, str)
@@ -184,33 +177,12 @@ if prompt := st.chat_input() or len(voice_prompt) > 3:
     if not prompt_flag:
         prompt = voice_prompt
 
-    # Get tools
-    tools = asyncio.run(get_tools())
-
-    # Add relevant files to message content
-    message_content = []
-    with_files = False
-    for entry in os.listdir(input_file_path):
-        entry_abspath = os.path.join(input_file_path, entry)
-        file_type = None
-        file_contents = None
-
-        # Get file as bytes
-        with open(entry_abspath, "rb") as file:
-            file_bytes = b64encode(file.read()).decode('utf-8')
+    # Get tools, served from the catalog cache in steady state
+    tools = tool_catalog.get_tools()
 
-        # Format bytes for OpenAI standard
-        if "image" in entry:
-            file_type = "image_url"
-            file_contents = {"url": f"data:image/jpeg;base64,{file_bytes}"}
-
-        # Abort for invalid files
-        if file_type is None or file_contents is None:
-            continue
-
-        # Add message content based on file type
-        message_content.append({"type": file_type, file_type: file_contents})
-        with_files = True
+    # Add this session's uploaded images to message content
+    message_content = list(st.session_state.uploaded_images.values())
+    with_files = len(message_content) > 0
 
     # Add prompt to message content
     message_content.append({"type": "text", "text": prompt})
@@ -220,36 +192,58 @@ if prompt := st.chat_input() or len(voice_prompt) > 3:
     st.session_state.displayed_messages.append({"role": "user", "content": prompt})
     st.chat_message("user").write(prompt)
 
-    # Generate response
-    response = st.session_state.openai_client.chat.completions.create(
-        model=MODEL_ID,
-        messages=st.session_state.messages,
-        max_tokens=max_tokens,
-        tools=tools
-    )
-
-    # Call tools and save results
-    tool_calls = response.choices[0].message.tool_calls
-    if tool_calls is not None and len(tool_calls):
-        for tool in tool_calls:
-            result = asyncio.run(call_tool(tool))
-            st.session_state.messages.append({"role": "user", "content": result.content})
-
-        # Get next response from LLM
-        response = st.session_state.openai_client.chat.completions.create(
-            model=MODEL_ID,
-            messages=st.session_state.messages,
-            max_tokens=max_tokens
-        )
-
-    # Generate message footer
-    footer = (f'✒︎***Content created with:*** {"aaron/torchrun-medgemma-27b-grpo-merged"}, Latency: {(time() - start_time) * 1000:.2f} ms, '
-              f'Completion Tokens: {response.usage.completion_tokens}, Prompt Tokens: {response.usage.prompt_tokens}, '
-              f'Total Tokens: {response.usage.total_tokens}')
-
-    # Display text and save to message memory
-    response = response.choices[0].message.content
-    response_formatted = f"{response}\n\n {footer}"
-    st.session_state.messages.append({"role": "assistant", "content": response})
-    st.session_state.displayed_messages.append({"role": "assistant", "content": response_formatted})
-    st.chat_message("ai", avatar='🤵').write(response_formatted)
+    # Near-identical first questions are answered from the semantic cache when it is enabled, decided before pruning
+    # can fold earlier turns away
+    cache_prompt = cacheable_prompt(st.session_state.messages) if semantic_cache is not None else None
+
+    # Keep the history within the prompt token budget
+    pruned_tokens = st.session_state.context_window.prepare(st.session_state.messages)
+
+    if cache_prompt is not None:
+        lookup_start = time()
+        cached_answer, similarity = semantic_cache.lookup(cache_prompt, MODEL_ID)
+        cache_text = f'Semantic Cache: {"hit" if cached_answer else "miss"} ({(time() - lookup_start) * 1000:.0f} ms)'
+    else:
+        cached_answer, cache_text = None, None
+
+    with st.chat_message("ai", avatar='🤵'):
+        if cached_answer is not None:
+            displayed = answer = cached_answer
+            st.write(displayed)
+
+            footer = (f'⚡***Served from semantic cache*** (similarity {similarity:.3f}), '
+                      f'Latency: {(time() - start_time) * 1000:.2f} ms, {cache_text}')
+        else:
+            # Stream the response across as many tool rounds as the model needs
+            agent = AgentLoop(mcp_session, on_tool_calls=announce_tool_calls)
+            displayed = st.write_stream(agent.iter_text(
+                st.session_state.openai_client,
+                st.session_state.messages,
+                tools=tools,
+                start_time=start_time,
+                model=MODEL_ID,
+                max_tokens=max_tokens
+            )) or ''
+            answer = agent.content
+
+            if agent.completion.usage is not None:
+                st.session_state.context_window.observe(
+                    st.session_state.messages, agent.completion.usage.prompt_tokens, tools=agent.request_tools
+                )
+            if cache_prompt is not None:
+                semantic_cache.store(cache_prompt, answer, MODEL_ID)
+
+            # Generate message footer
+            ttft_text = f'{agent.ttft * 1000:.2f} ms' if agent.ttft is not None else 'n/a'
+            footer = (f'✒︎***Content created with:*** {"aaron/torchrun-medgemma-27b-grpo-merged"}, '
+                      f'TTFT: {ttft_text}, Latency: {(time() - start_time) * 1000:.2f} ms, '
+                      f'{format_usage(agent.completion.usage)}, '
+                      f'Pruned Tokens: {pruned_tokens}, Rounds: {format_rounds(agent.rounds)}')
+            if cache_text is not None:
+                footer += f', {cache_text}'
+
+        st.write(footer)
+
+    # Save to message memory
+    st.session_state.messages.append({"role": "assistant", "content": answer})
+    st.session_state.displayed_messages.append({"role": "assistant", "content": f"{displayed}\n\n {footer}"})
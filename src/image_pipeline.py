@@ -0,0 +1,135 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from base64 import b64encode
+from collections import OrderedDict
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+
+# Gemma 3 / MedGemma's vision encoder works on 896x896 inputs, anything larger is downscaled by the server anyway
+IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', 896))
+JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', 85))
+
+# Encoded images kept in memory, keyed by a hash of the original bytes
+IMAGE_CACHE_SIZE = int(os.getenv('IMAGE_CACHE_SIZE', 64))
+
+# Leading bytes of the formats the uploaders accept
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+# MIME type from the file contents rather than its name
+def sniff_mime_type(data: bytes):
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def _reencode(data: bytes):
+    with Image.open(io.BytesIO(data)) as image:
+        # Phone photos are often stored sideways with an EXIF rotation flag
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+
+        # JPEG has no alpha channel, flatten transparency onto white
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+        return output.getvalue(), 'image/jpeg'
+
+
+class ImagePipeline:
+    """
+    Prepares uploaded images for the vision model.
+
+    Images are downscaled to fit IMAGE_MAX_SIDE and re-encoded as JPEG, then cached as data URLs keyed by the SHA-256
+    of the original bytes, so an image re-sent on every Streamlit rerun or prompt is only decoded once. Without
+    Pillow, or for files Pillow cannot read, the original bytes are passed through with their sniffed MIME type.
+    """
+
+    def __init__(self, max_size: int = IMAGE_CACHE_SIZE):
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters exposed through stats()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @staticmethod
+    def content_hash(data: bytes):
+        return hashlib.sha256(data).hexdigest()
+
+    def _encode(self, data: bytes, mime_type: str | None):
+        if Image is not None:
+            try:
+                return _reencode(data)
+            except Exception as e:
+                logger.warning(f'Could not re-encode image, sending it unchanged: {type(e).__name__}: {e}')
+
+        return data, sniff_mime_type(data) or mime_type or 'image/jpeg'
+
+    def data_url(self, data: bytes, mime_type: str | None = None):
+        """Data URL for an image, re-encoded on first sight and served from the cache afterwards"""
+        key = self.content_hash(data)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+
+        encoded, encoded_type = self._encode(data, mime_type)
+        url = f'data:{encoded_type};base64,{b64encode(encoded).decode("utf-8")}'
+
+        with self._lock:
+            self.misses += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(encoded)
+            self._cache[key] = url
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+        return url
+
+    def content_part(self, data: bytes, mime_type: str | None = None):
+        """OpenAI image_url message content part"""
+        return {"type": "image_url", "image_url": {"url": self.data_url(data, mime_type)}}
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'pillow': Image is not None,
+            'size': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'compression_ratio': self.bytes_out / self.bytes_in if self.bytes_in else 1.0,
+        }
+
+
+# Shared by the front-ends in this process
+image_pipeline = ImagePipeline()
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+from time import monotonic
+from mcp_master.master_server.master_server_client import TOOL_NAME_ORIGIN_SEPARATOR
+from mcp_master.orchestration.agent_protocol import MultiAgentState
+from mcp_master.orchestration.agents import judge_node
+
+logger = logging.getLogger(__name__)
+
+
+# inline: the judge gates every answer (the library's behaviour), deferred: answers are returned immediately and judged
+# in the background, off: only the validators below run
+JUDGE_MODE = os.getenv('JUDGE_MODE', 'inline')
+JUDGE_MODES = ('inline', 'deferred', 'off')
+
+# Share of answers sent to the judge, the rest are accepted as they are
+JUDGE_SAMPLE_RATE = float(os.getenv('JUDGE_SAMPLE_RATE', 1.0))
+
+# Background judgements in flight at once in deferred mode, further answers go unjudged
+JUDGE_MAX_PENDING = int(os.getenv('JUDGE_MAX_PENDING', 8))
+
+ICD10_CODE_PATTERN = re.compile(r'^[A-Z][0-9][0-9A-Z](\.[0-9A-Z]{1,4})?$')
+
+
+# Unqualified names of the tools the selector (or the router) called, None when the selector answered by itself
+def requested_tool_names(tools_requested):
+    if not tools_requested:
+        return None
+
+    names = []
+    for tool in tools_requested:
+        name = tool['name'] if isinstance(tool, dict) else getattr(getattr(tool, 'function', None), 'name', None)
+        if name is None:
+            return None
+        names.append(name.split(TOOL_NAME_ORIGIN_SEPARATOR)[0])
+    return names
+
+
+# Feedback for the selector when ICD-10 results are empty or malformed, None when they are a list of [code, name] pairs
+def validate_icd10_results(external_data):
+    if not external_data:
+        return 'The ICD-10 search returned no codes. Retry with a shorter or more general condition name.'
+
+    for text in external_data:
+        try:
+            rows = json.loads(text)
+        except ValueError:
+            return f'The ICD-10 search returned an unexpected response: {text[:200]}'
+
+        if not rows:
+            return 'The ICD-10 search returned no codes. Retry with a shorter or more general condition name.'
+
+        for row in rows:
+            if not (isinstance(row, list) and len(row) == 2 and ICD10_CODE_PATTERN.match(str(row[0]))
+                    and str(row[1]).strip()):
+                return f'The ICD-10 search returned a malformed entry: {row}'
+
+    return None
+
+
+# Deterministic validators for structured tools, keyed by unqualified tool name
+JUDGE_VALIDATORS = {
+    'get_icd10_code_basic': validate_icd10_results,
+    'get_icd10_code_advanced': validate_icd10_results,
+}
+
+
+class JudgePolicy:
+    """
+    Decides which answers reach the judge model, which the library calls for every tool result.
+
+    Results of structured tools with a validator in `validators` are checked deterministically instead: valid results
+    are accepted without the judge, and invalid ones are sent back to the selector with the validator's feedback (once
+    per question, a second failure goes to the judge as usual). Of the remaining answers, `sample_rate` are judged
+    according to `mode` (see JUDGE_MODE). Deferred judgements run in a worker thread after the answer has been
+    returned; a rejection is logged, counted and passed to `on_rejected(question)` so caches can drop the answer.
+
+    Answers accepted by the judge model or a validator, inline or deferred, are passed to `on_accepted(state)`.
+    Answers that were sampled out or never judged are not.
+    """
+
+    def __init__(self, mode: str = JUDGE_MODE, sample_rate: float = JUDGE_SAMPLE_RATE,
+                 max_pending: int = JUDGE_MAX_PENDING, validators: dict | None = None, judge=judge_node,
+                 on_rejected=None, on_accepted=None):
+        if mode not in JUDGE_MODES:
+            raise ValueError(f'Unknown judge mode {mode!r}, expected one of {JUDGE_MODES}.')
+
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.validators = JUDGE_VALIDATORS if validators is None else validators
+        self.judge = judge
+        self.on_rejected = on_rejected
+        self.on_accepted = on_accepted
+        self._pending = set()
+
+        # Counters exposed through stats()
+        self.validated = 0
+        self.validator_rejections = 0
+        self.sampled_out = 0
+        self.judged = 0
+        self.rejections = 0
+        self.deferred = 0
+        self.deferred_rejections = 0
+        self.dropped = 0
+        self.judge_seconds = 0.0
+
+    def validate(self, state: MultiAgentState):
+        """(True, None) for valid results, (False, feedback) for invalid ones, (None, None) without a validator"""
+        names = requested_tool_names(state.tools_requested)
+        if not names or any(name not in self.validators for name in names):
+            return None, None
+
+        for name in dict.fromkeys(names):
+            feedback = self.validators[name](state.external_data)
+            if feedback is not None:
+                return False, feedback
+        return True, None
+
+    async def judge_node(self, state: MultiAgentState):
+        valid, feedback = self.validate(state)
+        if valid:
+            self.validated += 1
+            logger.info('Tool results passed validation, skipping the judge.')
+            self._accepted(state)
+            return {'qa_assessment': 'GOOD'}
+
+        # Retry once with the validator's feedback, like a BAD judgement
+        if valid is False and not state.qa_feedback:
+            self.validator_rejections += 1
+            logger.info(f'Tool results failed validation: {feedback}')
+            state.messages.append({"role": "assistant", "content": f"Bad answer - {feedback}"})
+            return {'qa_assessment': 'BAD', 'qa_feedback': feedback, 'messages': state.messages}
+
+        if self.mode == 'off' or random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return {'qa_assessment': 'GOOD'}
+
+        if self.mode == 'deferred':
+            self._defer(state)
+            return {'qa_assessment': 'GOOD'}
+
+        # The library's judge blocks on its model request, keep it off the event loop
+        result = await self._judge(state)
+        if 'GOOD' in result.get('qa_assessment', '').upper():
+            self._accepted(state)
+        else:
+            self.rejections += 1
+        return result
+
+    def _accepted(self, state: MultiAgentState):
+        if self.on_accepted is not None:
+            self.on_accepted(state)
+
+    async def _judge(self, state: MultiAgentState):
+        start = monotonic()
+        try:
+            return await asyncio.to_thread(self.judge, state)
+        finally:
+            self.judged += 1
+            self.judge_seconds += monotonic() - start
+
+    def _defer(self, state: MultiAgentState):
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            logger.warning(f'{len(self._pending)} judgements already pending, not judging: {state.question}')
+            return
+
+        self.deferred += 1
+        task = asyncio.create_task(self._judge_later(state.model_copy(deep=True)))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _judge_later(self, state: MultiAgentState):
+        try:
+            result = await self._judge(state)
+        except Exception as e:
+            logger.error(f'Deferred judgement failed: {e}')
+            return
+
+        if 'GOOD' in result.get('qa_assessment', '').upper():
+            self._accepted(state)
+            return
+
+        self.deferred_rejections += 1
+        logger.warning(f'Judge rejected an answer already returned for {state.question!r}: {result.get("qa_feedback")}')
+        if self.on_rejected is not None:
+            self.on_rejected(state.question)
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'sample_rate': self.sample_rate,
+            'validated': self.validated,
+            'validator_rejections': self.validator_rejections,
+            'sampled_out': self.sampled_out,
+            'judged': self.judged,
+            'rejections': self.rejections,
+            'deferred': self.deferred,
+            'deferred_rejections': self.deferred_rejections,
+            'deferred_pending': len(self._pending),
+            'dropped': self.dropped,
+            'average_judge_ms': self.judge_seconds / self.judged * 1000 if self.judged else 0.0,
+        }
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+from dataclasses import dataclass, field
+from time import monotonic
+from fastmcp import Client
+
+logger = logging.getLogger(__name__)
+
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+MCP_SERVERS_DIR = os.path.normpath(os.path.join(SRC_DIR, '../mcp-servers'))
+
+# Seconds a server has to answer an MCP list_tools probe after starting, and between probes
+READY_TIMEOUT = float(os.getenv('LAUNCHER_READY_TIMEOUT', 60))
+PROBE_INTERVAL = float(os.getenv('LAUNCHER_PROBE_INTERVAL', 0.25))
+PROBE_TIMEOUT = float(os.getenv('LAUNCHER_PROBE_TIMEOUT', 5))
+
+# Restart backoff doubles from the initial delay up to the max, and resets once a server stays up this long
+RESTART_BACKOFF_INITIAL = float(os.getenv('LAUNCHER_RESTART_BACKOFF_INITIAL', 1))
+RESTART_BACKOFF_MAX = float(os.getenv('LAUNCHER_RESTART_BACKOFF_MAX', 60))
+RESTART_STABLE_SECONDS = float(os.getenv('LAUNCHER_RESTART_STABLE_SECONDS', 120))
+
+# Seconds servers get to exit after SIGTERM on shutdown before they are killed
+SHUTDOWN_TIMEOUT = 10.0
+
+# Tells master_mcp_server.py not to start sub-servers itself
+SUPERVISED_ENV = 'HEARTBIT_SUPERVISED'
+
+
+@dataclass
+class ManagedServer:
+    """One supervised MCP server process"""
+    name: str
+    script: str
+    cwd: str
+    url: str
+
+    process: asyncio.subprocess.Process | None = None
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    startup_seconds: float | None = None
+    restarts: int = 0
+
+
+SUB_SERVERS = [
+    ManagedServer('pubmed_server', 'pubmed_server.py', MCP_SERVERS_DIR, 'http://localhost:8001/mcp'),
+    ManagedServer('medrxiv_server', 'medrxiv_server.py', MCP_SERVERS_DIR, 'http://localhost:8002/mcp'),
+    ManagedServer('icd10_server', 'icd10_server.py', MCP_SERVERS_DIR, 'http://localhost:8003/mcp'),
+]
+
+MASTER_SERVER = ManagedServer('master_server', 'master_mcp_server.py', SRC_DIR, 'http://localhost:8089/mcp')
+
+
+# True once the server completes an MCP handshake and lists its tools
+async def probe(url: str, timeout: float = PROBE_TIMEOUT):
+    try:
+        async with Client(url, timeout=timeout) as client:
+            await client.list_tools()
+        return True
+    except Exception:
+        return False
+
+
+class Launcher:
+    """
+    Starts the sub-servers in parallel, then the master server once every sub-server answers an MCP probe, and keeps
+    them running.
+
+    A server counts as started when it answers list_tools over MCP, not when its process exists, so the front-ends
+    never reach a server that is still importing or building its indexes. A server is not started while another
+    process already answers at its URL. Servers that exit are restarted with exponential backoff, and the master is
+    restarted after a sub-server restart since its sessions to the old process are dead. The master runs with
+    HEARTBIT_SUPERVISED set so it does not spawn sub-servers of its own.
+    """
+
+    def __init__(self, sub_servers=None, master: ManagedServer | None = MASTER_SERVER,
+                 ready_timeout: float = READY_TIMEOUT):
+        self.sub_servers = SUB_SERVERS if sub_servers is None else sub_servers
+        self.master = master
+        self.ready_timeout = ready_timeout
+        self._stopping = False
+        self._tasks = []
+
+    @property
+    def servers(self):
+        return self.sub_servers + ([self.master] if self.master is not None else [])
+
+    async def _start(self, server: ManagedServer):
+        server.ready.clear()
+        server.process = None
+
+        # Another process on the port, e.g. a server started by hand, would answer the probes meant for ours
+        if await probe(server.url):
+            logger.error(f'Another process already answers at {server.url}, not starting {server.name}.')
+            return False
+
+        server.process = await asyncio.create_subprocess_exec(
+            sys.executable, server.script, cwd=server.cwd, env={**os.environ, SUPERVISED_ENV: '1'}
+        )
+        logger.info(f'Started {server.name} (pid {server.process.pid}).')
+
+        start = monotonic()
+        while monotonic() - start < self.ready_timeout:
+            if server.process.returncode is not None:
+                return False
+            # A probe that raced the process's exit (e.g. on a bind failure) reached someone else
+            if await probe(server.url) and server.process.returncode is None:
+                server.startup_seconds = monotonic() - start
+                server.ready.set()
+                logger.info(f'{server.name} ready at {server.url} after {server.startup_seconds:.2f}s.')
+                return True
+            await asyncio.sleep(PROBE_INTERVAL)
+
+        logger.error(f'{server.name} did not answer at {server.url} within {self.ready_timeout:.0f}s.')
+        return False
+
+    async def _supervise(self, server: ManagedServer):
+        backoff = RESTART_BACKOFF_INITIAL
+        while not self._stopping:
+            started_at = monotonic()
+            if await self._start(server):
+                if server.restarts and server is not self.master:
+                    await self._restart_master(server)
+                await server.process.wait()
+            else:
+                await self._stop(server)
+
+            if self._stopping:
+                return
+
+            # Servers that stayed up for a while crashed rather than failing to start, restart them promptly
+            if monotonic() - started_at >= RESTART_STABLE_SECONDS:
+                backoff = RESTART_BACKOFF_INITIAL
+
+            server.restarts += 1
+            if server.process is None:
+                logger.warning(f'{server.name} was not started, retrying in {backoff:.1f}s.')
+            else:
+                logger.warning(f'{server.name} exited with code {server.process.returncode}, '
+                               f'restarting in {backoff:.1f}s.')
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+
+    # The master's client keeps the sessions it opened to the sub-servers at startup, which die with a restarted
+    # sub-server's old process. Stopping the master lets its supervisor start it again with fresh sessions.
+    async def _restart_master(self, server: ManagedServer):
+        if self.master is None or self.master.process is None or self.master.process.returncode is not None:
+            return
+
+        logger.info(f'Restarting {self.master.name} to reconnect to {server.name}.')
+        await self._stop(self.master)
+
+    async def _stop(self, server: ManagedServer):
+        process = server.process
+        if process is None or process.returncode is not None:
+            return
+
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    def report(self):
+        lines = [f'{"Server":<16}{"URL":<30}{"Startup":>10}{"Restarts":>10}']
+        for server in self.servers:
+            startup = f'{server.startup_seconds:.2f}s' if server.startup_seconds is not None else '-'
+            lines.append(f'{server.name:<16}{server.url:<30}{startup:>10}{server.restarts:>10}')
+        return '\n'.join(lines)
+
+    async def run(self):
+        start = monotonic()
+        self._tasks = [asyncio.create_task(self._supervise(server)) for server in self.sub_servers]
+
+        # The master lists sub-server tools once at startup, so it waits for all of them
+        await asyncio.gather(*(server.ready.wait() for server in self.sub_servers))
+        if self.master is not None:
+            self._tasks.append(asyncio.create_task(self._supervise(self.master)))
+            await self.master.ready.wait()
+
+        print(f'\n{self.report()}\nAll servers ready in {monotonic() - start:.2f}s.\n', flush=True)
+        await asyncio.gather(*self._tasks)
+
+    async def shutdown(self):
+        self._stopping = True
+        await asyncio.gather(*(self._stop(server) for server in self.servers))
+        for task in self._tasks:
+            task.cancel()
+        logger.info('All servers shut down.')
+
+
+async def main(include_master: bool = True):
+    launcher = Launcher(master=MASTER_SERVER if include_master else None)
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    run = asyncio.create_task(launcher.run())
+    await asyncio.wait([run, asyncio.create_task(stop.wait())], return_when=asyncio.FIRST_COMPLETED)
+    await launcher.shutdown()
+    run.cancel()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Start and supervise the Heartbit MCP servers.')
+    parser.add_argument('--no-master', action='store_true', help='Only start the sub-servers')
+    args = parser.parse_args()
+
+    asyncio.run(main(include_master=not args.no_master))
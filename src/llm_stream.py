@@ -0,0 +1,129 @@
+from dataclasses import dataclass, field
+from time import time
+
+
+# Request the final usage chunk so token counts survive streaming
+STREAM_OPTIONS = {"include_usage": True}
+
+
+@dataclass
+class StreamedFunction:
+    name: str = ''
+    arguments: str = ''
+
+
+@dataclass
+class StreamedToolCall:
+    id: str = ''
+    type: str = 'function'
+    function: StreamedFunction = field(default_factory=StreamedFunction)
+
+
+class StreamedCompletion:
+    """
+    Assembles a streamed chat completion chunk by chunk.
+
+    Text deltas are handed back to the caller as they arrive for rendering, while tool-call deltas (which arrive as
+    fragments of the name and JSON arguments, keyed by index) are concatenated into StreamedToolCall objects shaped
+    like the non-streamed message.tool_calls. The time of the first content or tool-call delta is kept for TTFT.
+    """
+
+    def __init__(self, start_time: float | None = None):
+        self.start_time = start_time if start_time is not None else time()
+        self.first_token_time = None
+        self.end_time = None
+        self.content = ''
+        self.usage = None
+        self.finish_reason = None
+        self._tool_calls = {}
+
+    @property
+    def tool_calls(self):
+        return [self._tool_calls[index] for index in sorted(self._tool_calls)]
+
+    @property
+    def ttft(self):
+        """Seconds from start_time to the first generated token, None if nothing was generated"""
+        return self.first_token_time - self.start_time if self.first_token_time is not None else None
+
+    @property
+    def latency(self):
+        return self.end_time - self.start_time if self.end_time is not None else None
+
+    def message(self):
+        """The assistant message to append to the conversation history, tool calls included"""
+        # Tool-call-only turns carry null content, which every OpenAI-compatible server accepts
+        message = {"role": "assistant", "content": self.content or (None if self._tool_calls else '')}
+        if self._tool_calls:
+            message["tool_calls"] = [
+                {"id": call.id, "type": call.type,
+                 "function": {"name": call.function.name, "arguments": call.function.arguments}}
+                for call in self.tool_calls
+            ]
+        return message
+
+    def consume(self, chunk):
+        """Fold one chunk into the completion, returning its text delta (possibly empty)"""
+        # The usage chunk comes last and has no choices
+        if chunk.usage is not None:
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return ''
+
+        choice = chunk.choices[0]
+        delta = choice.delta
+        if choice.finish_reason is not None:
+            self.finish_reason = choice.finish_reason
+
+        text = delta.content or ''
+        if (text or delta.tool_calls) and self.first_token_time is None:
+            self.first_token_time = time()
+
+        for fragment in delta.tool_calls or []:
+            # Some OpenAI-compatible servers omit ids, tool results still need one to refer to
+            call = self._tool_calls.setdefault(fragment.index, StreamedToolCall(f'call_{fragment.index}'))
+            if fragment.id:
+                call.id = fragment.id
+            if fragment.function is not None:
+                call.function.name += fragment.function.name or ''
+                call.function.arguments += fragment.function.arguments or ''
+
+        self.content += text
+        return text
+
+    def load(self, response):
+        """Fill the completion from a non-streamed response, returning its text"""
+        message = response.choices[0].message
+        self.first_token_time = self.end_time = time()
+        self.content = message.content or ''
+        self.usage = response.usage
+        self.finish_reason = response.choices[0].finish_reason
+        for index, call in enumerate(message.tool_calls or []):
+            self._tool_calls[index] = StreamedToolCall(
+                call.id or f'call_{index}', call.type, StreamedFunction(call.function.name, call.function.arguments)
+            )
+        return self.content
+
+    def iter_text(self, stream):
+        """Consume a synchronous stream, yielding text deltas as they arrive"""
+        for chunk in stream:
+            text = self.consume(chunk)
+            if text:
+                yield text
+        self.end_time = time()
+
+    async def aiter_text(self, stream):
+        """Consume an async stream, yielding text deltas as they arrive"""
+        async for chunk in stream:
+            text = self.consume(chunk)
+            if text:
+                yield text
+        self.end_time = time()
+
+
+# Footer fields for a finished completion
+def format_usage(usage):
+    if usage is None:
+        return 'Token usage unavailable'
+    return (f'Completion Tokens: {usage.completion_tokens}, Prompt Tokens: {usage.prompt_tokens}, '
+            f'Total Tokens: {usage.total_tokens}')
@@ -1,6 +1,7 @@
-from mcp_master import MasterMCPServer, SubServer
+from mcp_master import SubServer
 from mcp_master import global_config as gconfig
 from os import getenv, path
+from heartbit_master_server import HeartbitMasterMCPServer
 
 model_id_c37 = "us.anthropic.claude-3-7-sonnet-20250219-v1:0"
 model_id_c35 = "us.anthropic.claude-3-5-haiku-20241022-v1:0"
@@ -12,9 +13,13 @@ gconfig.judge_model_id = 'alfredcs/torchrun-medgemma-27b-grpo-merged'
 gconfig.judge_model_service_url = 'http://mcp1.cavatar.info:8081/v1'
 gconfig.OPENAI_API_KEY = getenv('bedrock_api_token')
 gconfig.OPENAI_BASE_URL = getenv('bedrock_api_url') #'http://infs.cavatar.info:8081'
-gconfig.autostart_abspath = path.normpath(path.join(path.dirname(__file__), '../mcp-servers'))
 
-master_server = MasterMCPServer(
+# Under launcher.py the sub-servers are already supervised, otherwise start any that are not running
+if not getenv('HEARTBIT_SUPERVISED'):
+    gconfig.autostart_abspath = path.normpath(path.join(path.dirname(__file__), '../mcp-servers'))
+
+# Tool results from the sub-servers are cached, see /stats on the master port
+master_server = HeartbitMasterMCPServer(
     port=8089,
     sub_servers=[
         SubServer(url="http://localhost:8001/mcp", identifier='pubmed_server'),
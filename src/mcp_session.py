@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import threading
+import httpx
+from fastmcp import Client
+from fastmcp.client.messages import MessageHandler
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds between pings of an idle session, and the reconnect backoff bounds
+HEALTH_CHECK_INTERVAL = 30.0
+RECONNECT_BACKOFF_INITIAL = 0.5
+RECONNECT_BACKOFF_MAX = 10.0
+CONNECT_ATTEMPTS = 3
+
+SERVER_UNAVAILABLE_MESSAGE = 'Ensure master_mcp_server.py is running before starting the chatbot.'
+
+
+class _SessionMessageHandler(MessageHandler):
+    """Forwards server notifications to the manager's listeners"""
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    async def on_tool_list_changed(self, message):
+        logger.info('MCP server reported a tool list change.')
+        for callback in self._manager._on_tool_list_changed:
+            callback()
+
+
+class MCPSessionManager:
+    """
+    Long-lived, reconnecting MCP client session shared by the Streamlit and terminal front-ends.
+
+    The session lives on a private event loop in a daemon thread, so it survives Streamlit reruns (each of which
+    would otherwise need its own asyncio.run) and is opened once instead of per call. Synchronous callers use
+    list_tools/call_tool; coroutines use the a-prefixed variants, which do not block the caller's loop.
+    """
+
+    def __init__(self, url: str, health_check_interval: float = HEALTH_CHECK_INTERVAL):
+        self.url = url
+        self.health_check_interval = health_check_interval
+
+        self._client = None
+        self._connect_lock = None
+        self._on_connect = []
+        self._on_tool_list_changed = []
+
+        # Counters exposed through stats()
+        self.connects = 0
+        self.reconnects = 0
+        self.calls = 0
+        self.failed_health_checks = 0
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='mcp-session', daemon=True)
+        self._thread.start()
+        self._health_task = self.submit(self._health_loop())
+
+    # --- Loop bridging ---------------------------------------------------------------------------------------------
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the session loop, returning a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def run(self, coroutine, timeout: float | None = None):
+        """Run a coroutine on the session loop and block for its result"""
+        return self.submit(coroutine).result(timeout)
+
+    async def arun(self, coroutine):
+        """Await a coroutine on the session loop from another event loop"""
+        return await asyncio.wrap_future(self.submit(coroutine))
+
+    # --- Connection management -------------------------------------------------------------------------------------
+
+    def add_connect_listener(self, callback):
+        """Register callback(client) to run on the session loop after every (re)connect"""
+        self._on_connect.append(callback)
+
+    def add_tool_list_changed_listener(self, callback):
+        """Register callback() to run when the server sends notifications/tools/list_changed"""
+        self._on_tool_list_changed.append(callback)
+
+    async def _connect(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self._client is not None and self._client.is_connected():
+                return self._client
+
+            await self._disconnect()
+
+            backoff = RECONNECT_BACKOFF_INITIAL
+            for attempt in range(1, CONNECT_ATTEMPTS + 1):
+                client = Client(self.url, message_handler=_SessionMessageHandler(self))
+                try:
+                    await client.__aenter__()
+                except Exception as e:
+                    logger.warning(f'MCP connection attempt {attempt} to {self.url} failed: {type(e).__name__}: {e}')
+                    if attempt == CONNECT_ATTEMPTS:
+                        raise RuntimeError(SERVER_UNAVAILABLE_MESSAGE) from e
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
+                    continue
+
+                self._client = client
+                if self.connects:
+                    self.reconnects += 1
+                self.connects += 1
+                logger.info(f'MCP session to {self.url} established.')
+
+                for callback in self._on_connect:
+                    callback(client)
+                return client
+
+    async def _disconnect(self, failed=None):
+        # With `failed`, only close the session if it is still the current one. Concurrent callers that failed on the
+        # same session must not close the fresh one the first of them reconnected with.
+        if failed is not None and self._client is not failed:
+            return
+
+        client, self._client = self._client, None
+        if client is None:
+            return
+
+        try:
+            await client.__aexit__(None, None, None)
+        except Exception as e:
+            logger.debug(f'Ignoring error while closing MCP session: {e}')
+
+    async def _with_session(self, operation):
+        """Run operation(client), reconnecting once if the session turns out to be dead"""
+        client = await self._connect()
+        try:
+            return await operation(client)
+        except (ConnectionError, OSError, RuntimeError, httpx.TransportError) as e:
+            logger.warning(f'MCP session error, reconnecting: {type(e).__name__}: {e}')
+            await self._disconnect(client)
+            client = await self._connect()
+            return await operation(client)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            client = self._client
+            if client is None:
+                continue
+
+            try:
+                await asyncio.wait_for(client.ping(), timeout=self.health_check_interval / 2)
+            except Exception as e:
+                self.failed_health_checks += 1
+                logger.warning(f'MCP health check failed, reconnecting: {type(e).__name__}: {e}')
+                await self._disconnect(client)
+                try:
+                    await self._connect()
+                except RuntimeError:
+                    # Next call or health check tries again
+                    pass
+
+    # --- MCP operations --------------------------------------------------------------------------------------------
+
+    async def _list_tools(self):
+        return await self._with_session(lambda client: client.list_tools())
+
+    async def _call_tool(self, name: str, arguments, timeout: float | None = None):
+        # Models return arguments as a JSON string, parse rather than eval it
+        if isinstance(arguments, str):
+            arguments = json.loads(arguments) if arguments.strip() else {}
+
+        self.calls += 1
+        return await self._with_session(lambda client: client.call_tool(name, arguments, timeout=timeout))
+
+    async def _call_tools(self, calls, timeout: float | None = None):
+        async def call(name, arguments):
+            return await asyncio.wait_for(self._call_tool(name, arguments), timeout)
+
+        return await asyncio.gather(*(call(name, arguments) for name, arguments in calls), return_exceptions=True)
+
+    def list_tools(self):
+        return self.run(self._list_tools())
+
+    async def alist_tools(self):
+        return await self.arun(self._list_tools())
+
+    def call_tool(self, name: str, arguments, timeout: float | None = None):
+        return self.run(self._call_tool(name, arguments, timeout))
+
+    async def acall_tool(self, name: str, arguments, timeout: float | None = None):
+        return await self.arun(self._call_tool(name, arguments, timeout))
+
+    def call_tools(self, calls, timeout: float | None = None):
+        """
+        Run (name, arguments) tool calls concurrently on the session loop. Results come back in call order, with the
+        exception in place of the result for any call that failed or exceeded its timeout.
+        """
+        return self.run(self._call_tools(calls, timeout))
+
+    async def acall_tools(self, calls, timeout: float | None = None):
+        return await self.arun(self._call_tools(calls, timeout))
+
+    def stats(self):
+        return {
+            'connected': self._client is not None and self._client.is_connected(),
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'calls': self.calls,
+            'failed_health_checks': self.failed_health_checks,
+        }
+
+    def close(self):
+        self._health_task.cancel()
+        self.run(self._disconnect())
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+from time import monotonic, time
+from context_window import SUMMARY_HEADER
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
+
+
+# Opt-in, answers are only reused when this is set
+SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+# Small CPU embedding model, cosine similarity a cached prompt must reach, and how long answers stay valid
+SEMANTIC_CACHE_MODEL = os.getenv('SEMANTIC_CACHE_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.92))
+SEMANTIC_CACHE_TTL = float(os.getenv('SEMANTIC_CACHE_TTL', 24 * 60 * 60))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', 2000))
+
+
+# The prompt of a conversation the cache may answer: a single text-only user message, optionally after a system prompt.
+# Check before ContextWindow.prepare, which can fold earlier turns into a summary in the system prompt.
+def cacheable_prompt(messages):
+    system_messages = [message for message in messages if message.get('role') == 'system']
+    if any(SUMMARY_HEADER in str(message.get('content') or '') for message in system_messages):
+        return None
+
+    user_messages = [message for message in messages if message.get('role') != 'system']
+    if len(user_messages) != 1 or user_messages[0].get('role') != 'user':
+        return None
+
+    content = user_messages[0].get('content')
+    if isinstance(content, str):
+        return content.strip() or None
+    if any(part.get('type') != 'text' for part in content):
+        return None
+    return ' '.join(part.get('text', '') for part in content).strip() or None
+
+
+class SemanticCache:
+    """
+    Reuses answers to near-identical questions.
+
+    Prompts are embedded with a local sentence-transformers model on the CPU and kept, L2-normalised, in an in-process
+    numpy matrix, so a lookup is one matrix-vector product. A lookup hits when the most similar unexpired entry in the
+    same namespace (the model ID) reaches `threshold`. Only history-free, image-free prompts should be cached (see
+    cacheable_prompt), since the answer to a follow-up or an image question depends on more than its text. When full,
+    expired entries are dropped first, then the oldest.
+
+    Without sentence-transformers and numpy installed the cache reports itself unavailable and never hits.
+    """
+
+    def __init__(self, model_name: str = SEMANTIC_CACHE_MODEL, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl: float = SEMANTIC_CACHE_TTL, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._model = None
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._entries = []
+
+        # Counters exposed through stats()
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+
+    @property
+    def available(self):
+        return SentenceTransformer is not None
+
+    def _embed(self, text):
+        if self._model is None:
+            logger.info(f'Loading semantic cache embedding model {self.model_name}...')
+            self._model = SentenceTransformer(self.model_name, device='cpu')
+        return self._model.encode([text], normalize_embeddings=True)[0].astype(np.float32)
+
+    def _live(self, now):
+        return np.array([entry['expires_at'] > now for entry in self._entries], dtype=bool)
+
+    def lookup(self, prompt: str, namespace: str = ''):
+        """(answer, similarity) of the best match, answer None on a miss"""
+        if not self.available:
+            return None, 0.0
+
+        start = monotonic()
+        vector = self._embed(prompt)
+        with self._lock:
+            best, similarity = None, 0.0
+            if self._entries:
+                scores = self._vectors @ vector
+                mask = self._live(time()) & np.array([entry['namespace'] == namespace for entry in self._entries])
+                scores = np.where(mask, scores, -1.0)
+                index = int(np.argmax(scores))
+                similarity = float(scores[index])
+                if similarity >= self.threshold:
+                    best = self._entries[index]['answer']
+
+            self.lookup_seconds += monotonic() - start
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return best, similarity
+
+    def store(self, prompt: str, answer: str, namespace: str = ''):
+        if not self.available or not answer:
+            return
+
+        vector = self._embed(prompt)
+        now = time()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict(now)
+
+            entry = {'prompt': prompt, 'answer': answer, 'namespace': namespace, 'expires_at': now + self.ttl}
+            self._entries.append(entry)
+            self._vectors = vector[None, :] if self._vectors is None else np.vstack([self._vectors, vector])
+
+    def _evict(self, now):
+        keep = self._live(now)
+        if keep.all():
+            keep[:len(keep) - self.max_entries + 1] = False
+
+        self._entries = [entry for entry, kept in zip(self._entries, keep) if kept]
+        self._vectors = self._vectors[keep] if self._entries else None
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._vectors = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'available': self.available,
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'average_lookup_ms': self.lookup_seconds / lookups * 1000 if lookups else 0.0,
+        }
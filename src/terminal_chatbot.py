@@ -1,9 +1,17 @@
 try:
     import os
+    import argparse
     import asyncio
+    from time import time
     import torch
-    from openai import OpenAI
-    from fastmcp import Client
+    from openai import AsyncOpenAI
+    from mcp_session import MCPSessionManager
+    from tool_catalog import ToolCatalog
+    from llm_stream import format_usage
+    from agent_loop import AgentLoop, format_rounds
+    from context_window import ContextWindow
+    from image_pipeline import image_pipeline
+    from semantic_cache import SEMANTIC_CACHE_ENABLED, SemanticCache, cacheable_prompt
     from base64 import b64encode
 except ImportError:
     raise ImportError('Error importing modules. Ensure all packages from ../requirements.txt are installed. Run `pip '
@@ -23,75 +31,112 @@ if not os.path.exists(input_abspath):
 MODEL_ID = "google/gemma-3n-e4b-it" 
 FINETUNED_MODEL_ID = "alfredcs/gemma-3N-finetune"
 
-# Create vLLM client
+# Create vLLM clients, async so generation never blocks the event loop
 OPENAI_API_KEY = "EMPTY"
 
-client = OpenAI(
+client = AsyncOpenAI(
     api_key=OPENAI_API_KEY,
     base_url="http://mcp1.cavatar.info:8081/v1",
 )
 
-finetuned_client = OpenAI(
+finetuned_client = AsyncOpenAI(
     api_key=OPENAI_API_KEY,
     base_url="http://video.cavatar.info:8087/v1",
 )
 
-# Create FastMCP client
+# Shared MCP session, opened once and reused for every call
 MCP_URL = 'http://localhost:3000/mcp'
-mcp_client = Client(MCP_URL)
+mcp_session = MCPSessionManager(MCP_URL)
 
 
-# Get tools
-async def get_tools():
-    try:
-        async with mcp_client:
-            tools_list = await mcp_client.list_tools()
-
-            return list(map(tool_reformat, tools_list))
-    except RuntimeError:
-        raise RuntimeError('Ensure master_mcp_server.py is running before starting the chatbot.')
+# Tool catalog, only re-listed when the cache expires or the server reports a change
+tool_catalog = ToolCatalog(mcp_session)
 
 
-# Reformat FastMCP tools to OpenAI standard
-def tool_reformat(tool):
-    return {
-        'type': 'function',
-        'function': {
-            'name': tool.name,
-            'description': tool.description,
-            'parameters': tool.inputSchema,
-        },
-        'strict': True
-    }
-
-
-# Call tool
-async def call_tool(tool):
-    async with mcp_client:
-        return await mcp_client.call_tool(tool.function.name, tool.function.arguments)
+# Get tools
+async def get_tools():
+    return await tool_catalog.aget_tools()
 
 
 # See if file is an image or audio based on the extension
 def get_file_info(file_abspath: str):
     # Get file as bytes
     with open(file_abspath, "rb") as file:
-        encoded_bytes = b64encode(file.read()).decode('utf-8')
+        file_bytes = file.read()
 
     # Get file extension
     _, extension = os.path.splitext(file_abspath)
-    extension = extension[1:]
+    extension = extension[1:].lower()
 
     match extension:
         case "jpg" | "jpeg" | "png" | "webp":
-            return "image_url", { "url": f"data:image/jpeg;base64,{encoded_bytes}" }
+            # Resized and re-encoded with the correct MIME type, cached by content hash across queries
+            return "image_url", image_pipeline.content_part(file_bytes)["image_url"]
         case "mp3" | "wav":
-            return "input_audio", { "data": encoded_bytes, "format": extension }
+            return "input_audio", { "data": b64encode(file_bytes).decode('utf-8'), "format": extension }
         case _:
             return "UNKNOWN", None
 
 
+# Keeps the history within the prompt token budget
+context_window = ContextWindow()
+
+
+# Answer cache for near-identical first questions, None unless SEMANTIC_CACHE_ENABLED is set
+semantic_cache = SemanticCache() if SEMANTIC_CACHE_ENABLED else None
+
+
+# Answer from the semantic cache when possible, printing the hit and lookup time
+async def cached_answer(cache_prompt, model_id):
+    if cache_prompt is None:
+        return None
+
+    # Embedding runs on the CPU, keep it off the event loop
+    lookup_start = time()
+    answer, similarity = await asyncio.to_thread(semantic_cache.lookup, cache_prompt, model_id)
+    if answer is not None:
+        print(f"Chat response: {answer}\n\n[Served from semantic cache, similarity {similarity:.3f}, "
+              f"Lookup: {(time() - lookup_start) * 1000:.0f} ms]")
+    return answer
+
+
+# Run the agent loop, printing tokens as they arrive when streaming
+async def run_agent(model_client, model_id, stream: bool = True):
+    # Decided before pruning can fold earlier turns away, so follow-ups never look like first questions
+    cache_prompt = cacheable_prompt(messages) if semantic_cache is not None else None
+    pruned_tokens = context_window.prepare(messages)
+
+    answer = await cached_answer(cache_prompt, model_id)
+    if answer is not None:
+        return answer
+
+    agent = AgentLoop(
+        mcp_session,
+        on_tool_calls=lambda tool_calls: print(f'\n[Calling {", ".join(tool.function.name for tool in tool_calls)}]')
+    )
+
+    print("Chat response: ", end="", flush=True)
+    async for text in agent.aiter_text(model_client, messages, tools=await get_tools(), stream=stream, model=model_id):
+        if stream:
+            print(text, end="", flush=True)
+    if not stream:
+        print(agent.content, end="")
+
+    ttft = f'{agent.ttft * 1000:.0f} ms' if agent.ttft is not None else 'n/a'
+    print(f"\n\n[TTFT: {ttft}, Latency: {(agent.completion.end_time - agent.start_time) * 1000:.0f} ms, "
+          f"{format_usage(agent.completion.usage)}, Pruned Tokens: {pruned_tokens}, "
+          f"Rounds: {format_rounds(agent.rounds)}]")
+
+    if agent.completion.usage is not None:
+        context_window.observe(messages, agent.completion.usage.prompt_tokens, tools=agent.request_tools)
+    if cache_prompt is not None:
+        await asyncio.to_thread(semantic_cache.store, cache_prompt, agent.content, model_id)
+
+    return agent.content
+
+
 # Process a query
-async def process_query(query: str):
+async def process_query(query: str, stream: bool = True):
     global messages
 
     # Add relevant files to message content
@@ -131,17 +176,11 @@ async def process_query(query: str):
     # Fine-tuned does not support images or audio so use standard Gemma-3N otherwise
     if query_with_files:
         print(f'Querying with files {", ".join(files)}')
-        response = client.chat.completions.create(
-            model=MODEL_ID,
-            messages=messages,
-        )
+        model_client, model_id = client, MODEL_ID
     else:
-        response = finetuned_client.chat.completions.create(
-            model=FINETUNED_MODEL_ID,
-            messages=messages,
-        )
-    response = response.choices[0].message.content
-    print("Chat response:", response)
+        model_client, model_id = finetuned_client, FINETUNED_MODEL_ID
+
+    response = await run_agent(model_client, model_id, stream)
 
     # Save model output to message memory
     messages.append({"role": "assistant", "content": response})
@@ -151,7 +190,7 @@ async def process_query(query: str):
 # Main chat loop
 messages = []
 tools = []
-async def main():
+async def main(stream: bool = True):
     global messages, tools
 
     # Get tools
@@ -159,7 +198,8 @@ async def main():
 
     while True:
         # try:
-        query = input("\nQuery: ").strip()
+        # Read input in a worker thread so the loop stays free for MCP work
+        query = (await asyncio.to_thread(input, "\nQuery: ")).strip()
 
         # Exit the program if the user enters "quit"
         if query.lower() == "quit":
@@ -170,12 +210,18 @@ async def main():
             messages = []
             continue
 
-        response = await process_query(query)
-        print("\n" + response)
+        await process_query(query, stream)
 
         # except Exception as e:
         #     print(f"\n{type(e).__name__}: {str(e)}")
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Terminal medical assistant.")
+    parser.add_argument("--no-stream", action="store_true", help="Print responses only once they are complete")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(stream=not args.no_stream))
+    finally:
+        mcp_session.close()
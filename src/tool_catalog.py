@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import threading
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds a fetched catalog is served without asking the server again
+TOOL_CATALOG_TTL = 300.0
+
+
+# Reformat FastMCP tools to OpenAI standard
+def tool_reformat(tool):
+    return {
+        'type': 'function',
+        'function': {
+            'name': tool.name,
+            'description': tool.description,
+            'parameters': tool.inputSchema,
+        },
+        'strict': True
+    }
+
+
+# Stable fingerprint of the raw tool schemas
+def tools_hash(tools_list):
+    payload = json.dumps([tool.model_dump(mode='json') for tool in tools_list], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ToolCatalog:
+    """
+    Cached OpenAI-format tool list for an MCPSessionManager.
+
+    The catalog is keyed on the server's reported name/version and a hash of the tool schemas. It is served from
+    memory until the TTL lapses, the server sends notifications/tools/list_changed, the session reconnects to a
+    server reporting a different version, or invalidate() is called. A refresh whose hash matches the cached one
+    keeps the already converted list instead of reformatting it.
+    """
+
+    def __init__(self, session, ttl: float = TOOL_CATALOG_TTL):
+        self.session = session
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._tools = None
+        self._hash = None
+        self._server_version = None
+        self._expires_at = 0.0
+
+        # Counters exposed through stats()
+        self.hits = 0
+        self.refreshes = 0
+        self.changes = 0
+
+        session.add_tool_list_changed_listener(self.invalidate)
+        session.add_connect_listener(self._on_connect)
+
+    def _on_connect(self, client):
+        result = client.initialize_result
+        server_version = (result.serverInfo.name, result.serverInfo.version) if result is not None else None
+
+        if server_version != self._server_version:
+            if self._server_version is not None:
+                logger.info(f'MCP server version changed from {self._server_version} to {server_version}.')
+            self._server_version = server_version
+            self.invalidate()
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+    def _is_fresh(self):
+        return self._tools is not None and monotonic() < self._expires_at
+
+    def _store(self, tools_list):
+        self.refreshes += 1
+        new_hash = tools_hash(tools_list)
+        if new_hash != self._hash:
+            self.changes += 1
+            self._tools = list(map(tool_reformat, tools_list))
+            self._hash = new_hash
+            logger.info(f'Tool catalog updated with {len(self._tools)} tools ({new_hash[:12]}).')
+
+        self._expires_at = monotonic() + self.ttl
+        return self._tools
+
+    def get_tools(self):
+        if self._is_fresh():
+            self.hits += 1
+            return self._tools
+
+        # One refresh at a time, concurrent callers reuse its result
+        with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self._tools
+
+            return self._store(self.session.list_tools())
+
+    async def aget_tools(self):
+        if self._is_fresh():
+            self.hits += 1
+            return self._tools
+
+        return self._store(await self.session.alist_tools())
+
+    def stats(self):
+        return {
+            'tools': len(self._tools) if self._tools is not None else 0,
+            'hash': self._hash,
+            'server_version': self._server_version,
+            'hits': self.hits,
+            'refreshes': self.refreshes,
+            'changes': self.changes,
+        }
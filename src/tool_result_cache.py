@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import sys
+
+# The cache primitives are shared with the MCP servers
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__), '../mcp-servers')))
+from ttl_cache import MISSING, SingleFlight, TTLCache, normalize_query  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+# Sub-server results kept in memory, and the largest result (serialized) worth keeping
+TOOL_CACHE_SIZE = int(os.getenv('TOOL_CACHE_SIZE', 2048))
+TOOL_CACHE_MAX_RESULT_BYTES = int(os.getenv('TOOL_CACHE_MAX_RESULT_BYTES', 256 * 1024))
+TOOL_CACHE_DEFAULT_TTL = float(os.getenv('TOOL_CACHE_DEFAULT_TTL', 10 * 60))
+
+# Seconds results stay valid per sub-server tool: code tables and DOI metadata rarely change, searches pick up new
+# articles, so they expire quickly
+TOOL_CACHE_TTLS = {
+    'get_icd10_code_basic': 7 * 24 * 60 * 60,
+    'get_icd10_code_advanced': 7 * 24 * 60 * 60,
+    'get_medrxiv_metadata': 7 * 24 * 60 * 60,
+    'search_medrxiv_local': 60 * 60,
+    'search_medrxiv_key_words': 15 * 60,
+    'search_medrxiv_advanced': 15 * 60,
+    'search_pubmed': 15 * 60,
+}
+
+# Tools whose string arguments are case-insensitive, the ICD-10 server folds case itself. Elsewhere case matters:
+# PubMed only reads upper-case AND/OR/NOT as operators, and DOIs are kept as given
+TOOL_CACHE_CASE_INSENSITIVE = {'get_icd10_code_basic', 'get_icd10_code_advanced'}
+
+
+# Collapse whitespace in string arguments (and fold case when the tool ignores it) and sort keys, so equivalent calls
+# share an entry
+def canonical_arguments(arguments, defaults=None, fold_case=False):
+    arguments = {**(defaults or {}), **(arguments or {})}
+
+    def canonical(value):
+        if isinstance(value, str):
+            return normalize_query(value) if fold_case else ' '.join(value.split())
+        if isinstance(value, dict):
+            return {key: canonical(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [canonical(item) for item in value]
+        return value
+
+    return json.dumps(canonical(arguments), sort_keys=True, separators=(',', ':'), default=str)
+
+
+# Default argument values from an OpenAI-format tool's JSON schema
+def schema_defaults(tool):
+    properties = tool.get('function', {}).get('parameters', {}).get('properties', {})
+    return {name: schema['default'] for name, schema in properties.items() if 'default' in schema}
+
+
+class ToolResultCache:
+    """
+    Caches sub-server tool results in the master server, in front of MasterServerClient.call_tool.
+
+    Entries are keyed on the tool name and its canonicalized arguments (schema defaults filled in, whitespace in strings
+    collapsed, and case folded for tools in `case_insensitive`) and expire after the tool's TTL from `ttls`. Memory is
+    bounded by `max_size` entries of at most `max_result_bytes` each; failed calls, error results and oversized results
+    are never cached. Concurrent identical calls, common when the judge sends the selector back for another round,
+    share one sub-server request.
+    """
+
+    def __init__(self, max_size: int = TOOL_CACHE_SIZE, ttls: dict | None = None,
+                 default_ttl: float = TOOL_CACHE_DEFAULT_TTL, max_result_bytes: int = TOOL_CACHE_MAX_RESULT_BYTES,
+                 case_insensitive: set | None = None):
+        self.ttls = TOOL_CACHE_TTLS if ttls is None else ttls
+        self.case_insensitive = TOOL_CACHE_CASE_INSENSITIVE if case_insensitive is None else case_insensitive
+        self.default_ttl = default_ttl
+        self.max_result_bytes = max_result_bytes
+
+        self._cache = TTLCache(max_size=max_size, ttl=default_ttl)
+        self._flight = SingleFlight()
+        self._defaults = {}
+
+        # Counters exposed through stats()
+        self.oversized = 0
+        self.uncacheable = 0
+
+    def ttl(self, tool_name: str):
+        return self.ttls.get(tool_name, self.default_ttl)
+
+    def register_tools(self, tools):
+        """Remember schema defaults of (separator-qualified) OpenAI-format tools"""
+        for tool in tools:
+            self._defaults[tool['function']['name']] = schema_defaults(tool)
+
+    def key(self, qualified_name: str, tool_name: str, arguments):
+        return qualified_name, canonical_arguments(
+            arguments, self._defaults.get(qualified_name), fold_case=tool_name in self.case_insensitive
+        )
+
+    def _cacheable(self, result):
+        if result is None or getattr(result, 'isError', False):
+            self.uncacheable += 1
+            return False
+
+        size = len(result.model_dump_json()) if hasattr(result, 'model_dump_json') else len(str(result))
+        if size > self.max_result_bytes:
+            self.oversized += 1
+            return False
+        return True
+
+    async def call(self, qualified_name: str, tool_name: str, arguments, func):
+        """Serve the call from the cache, otherwise run func() once for all identical concurrent callers"""
+        key = self.key(qualified_name, tool_name, arguments)
+        result = self._cache.get(key)
+        if result is not MISSING:
+            logger.info(f'Tool result cache hit for {tool_name}.')
+            return result
+
+        async def load():
+            result = await func()
+            if self._cacheable(result):
+                self._cache.set(key, result, ttl=self.ttl(tool_name))
+            return result
+
+        return await self._flight.do(key, load)
+
+    def invalidate_tool(self, qualified_name: str):
+        for key in [key for key in self._cache._entries if key[0] == qualified_name]:
+            self._cache.invalidate(key)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return {
+            **self._cache.stats(),
+            'coalescing': self._flight.stats(),
+            'oversized': self.oversized,
+            'uncacheable': self.uncacheable,
+        }
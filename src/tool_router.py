@@ -0,0 +1,182 @@
+import logging
+import math
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+
+# The cache and store primitives are shared with the MCP servers
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(__file__), '../mcp-servers')))
+from kv_store import SQLiteStore  # noqa: E402
+from ttl_cache import MISSING, TTLCache, normalize_query  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+# Exact repeats of a question replay the selector's earlier tool calls for this long
+ROUTING_CACHE_SIZE = int(os.getenv('ROUTING_CACHE_SIZE', 1024))
+ROUTING_CACHE_TTL = float(os.getenv('ROUTING_CACHE_TTL', 24 * 60 * 60))
+
+# The local router only answers once it has seen enough selector decisions and is this sure of the tool
+ROUTER_MIN_EXAMPLES = int(os.getenv('ROUTER_MIN_EXAMPLES', 30))
+ROUTER_CONFIDENCE = float(os.getenv('ROUTER_CONFIDENCE', 0.9))
+
+# Past selector decisions the router trains on, empty disables persistence
+ROUTER_STORE_PATH = os.getenv('ROUTER_STORE_PATH', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'mcp-servers', 'cache', 'routing_decisions.sqlite3'))
+ROUTER_STORE_MAX_ROWS = int(os.getenv('ROUTER_STORE_MAX_ROWS', 20000))
+
+# Words that say which source to ask rather than what to ask it, dropped when building a query argument
+ROUTING_STOP_WORDS = {
+    'a', 'about', 'all', 'an', 'and', 'any', 'are', 'article', 'articles', 'can', 'code', 'codes', 'database', 'do',
+    'does', 'find', 'for', 'from', 'get', 'give', 'icd', 'icd10', 'icd-10', 'in', 'is', 'latest', 'list', 'look', 'me',
+    'medrxiv', 'of', 'on', 'paper', 'papers', 'please', 'preprint', 'preprints', 'publication', 'publications',
+    'pubmed', 'recent', 'research', 'search', 'show', 'studies', 'study', 'the', 'to', 'up', 'what', 'which', 'with',
+}
+
+DOI_PATTERN = re.compile(r'\b10\.\d{4,9}/[^\s"\'<>]+')
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9\-]*")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+# Keyword query for a tool's single free-text argument, or None when nothing specific is left
+def extract_query(question):
+    terms = [term for term in tokenize(question) if term not in ROUTING_STOP_WORDS]
+    return ' '.join(terms) or None
+
+
+# Arguments for a tool when its only required parameter can be filled from the question itself
+def build_arguments(tool, question):
+    parameters = tool['function'].get('parameters', {})
+    properties = parameters.get('properties', {})
+    required = parameters.get('required', [])
+    if len(required) != 1:
+        return None
+
+    name = required[0]
+    if name == 'doi':
+        match = DOI_PATTERN.search(question)
+        return {name: match.group(0).rstrip('.,;)')} if match else None
+
+    schema = properties.get(name, {})
+    if schema.get('type', 'string') != 'string':
+        return None
+
+    query = extract_query(question)
+    return {name: query} if query else None
+
+
+class ToolRouter:
+    """
+    Local pre-router that learns from the selector model's past choices.
+
+    A multinomial naive Bayes classifier over question words predicts the tool the selector would pick. It only
+    routes when it has been trained on at least `min_examples` decisions, its posterior for the top tool reaches
+    `confidence`, and that tool's arguments can be filled from the question (see build_arguments); every other
+    question goes to the selector model, whose decision is then learned. Decisions persist in a SQLite store so the
+    router keeps its training across restarts.
+    """
+
+    def __init__(self, store_path: str | None = ROUTER_STORE_PATH, min_examples: int = ROUTER_MIN_EXAMPLES,
+                 confidence: float = ROUTER_CONFIDENCE):
+        self.min_examples = min_examples
+        self.confidence = confidence
+
+        self._tool_counts = Counter()
+        self._word_counts = defaultdict(Counter)
+        self._word_totals = Counter()
+        self._vocabulary = set()
+        self.examples = 0
+
+        self.store = SQLiteStore(store_path, "routing_decisions", max_rows=ROUTER_STORE_MAX_ROWS) \
+            if store_path else None
+        if self.store is not None:
+            self._load()
+
+    def _load(self):
+        for question, tool_names in self.store.items().items():
+            self._train(question, tool_names)
+        logger.info(f'Tool router trained on {self.examples} stored routing decisions.')
+
+    def _train(self, question, tool_names):
+        words = tokenize(question)
+        for tool_name in tool_names:
+            self._tool_counts[tool_name] += 1
+            self._word_counts[tool_name].update(words)
+            self._word_totals[tool_name] += len(words)
+        self._vocabulary.update(words)
+        self.examples += 1
+
+    def learn(self, question, tool_names):
+        """Record the selector model's tool choice for a question"""
+        tool_names = sorted(set(tool_names))
+        if not tool_names:
+            return
+        self._train(question, tool_names)
+        if self.store is not None:
+            self.store.put(normalize_query(question), tool_names)
+
+    def predict(self, question):
+        """(tool name, posterior probability) of the most likely tool, (None, 0.0) before any training"""
+        if not self._tool_counts:
+            return None, 0.0
+
+        words = tokenize(question)
+        vocabulary_size = len(self._vocabulary) + 1
+        total = sum(self._tool_counts.values())
+
+        scores = {}
+        for tool_name, count in self._tool_counts.items():
+            score = math.log(count / total)
+            denominator = self._word_totals[tool_name] + vocabulary_size
+            for word in words:
+                score += math.log((self._word_counts[tool_name][word] + 1) / denominator)
+            scores[tool_name] = score
+
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+
+    def route(self, question, tools):
+        """[(tool name, arguments)] when confident enough to skip the selector model, otherwise None"""
+        # A posterior is only meaningful once the selector has been seen choosing between tools
+        if self.examples < self.min_examples or len(self._tool_counts) < 2:
+            return None
+
+        tool_name, probability = self.predict(question)
+        if tool_name is None or probability < self.confidence:
+            return None
+
+        tool = next((tool for tool in tools if tool['function']['name'] == tool_name), None)
+        if tool is None:
+            return None
+
+        arguments = build_arguments(tool, question)
+        if arguments is None:
+            return None
+
+        logger.info(f'Tool router sent the question to {tool_name} ({probability:.3f}) with {arguments}.')
+        return [(tool_name, arguments)]
+
+
+class RoutingCache:
+    """Selector decisions, as [(tool name, arguments)], for exact (normalized) repeats of a question"""
+
+    def __init__(self, max_size: int = ROUTING_CACHE_SIZE, ttl: float = ROUTING_CACHE_TTL):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    def get(self, question):
+        calls = self._cache.get(normalize_query(question))
+        return None if calls is MISSING else calls
+
+    def set(self, question, calls):
+        self._cache.set(normalize_query(question), calls)
+
+    def invalidate(self, question):
+        self._cache.invalidate(normalize_query(question))
+
+    def stats(self):
+        return self._cache.stats()
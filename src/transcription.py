@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+TRANSCRIPTION_URL = os.getenv('TRANSCRIPTION_URL', 'http://video.cavatar.info:8082/generate')
+
+# Seconds to connect, and to wait for the transcription of a clip
+TRANSCRIPTION_CONNECT_TIMEOUT = float(os.getenv('TRANSCRIPTION_CONNECT_TIMEOUT', 5))
+TRANSCRIPTION_TIMEOUT = float(os.getenv('TRANSCRIPTION_TIMEOUT', 60))
+
+# Transcripts kept in memory, keyed by a hash of the audio bytes
+TRANSCRIPTION_CACHE_SIZE = int(os.getenv('TRANSCRIPTION_CACHE_SIZE', 128))
+
+# Worker threads running submit()ted uploads
+TRANSCRIPTION_WORKERS = 2
+
+
+# The server's JSON reply flattened to text, as the chat input expects it
+def _format_transcript(data):
+    return json.dumps(data, indent=3).replace('"', '')
+
+
+class TranscriptionClient:
+    """
+    Pooled, cached client for the speech-to-text server.
+
+    Both paths reuse keep-alive connections and enforce connect/read timeouts: transcribe() blocks, submit() runs it in
+    a worker thread so the Streamlit script thread can keep rendering, and atranscribe() is for coroutines. Transcripts
+    are cached by the SHA-256 of the audio, so a clip that is still in the recorder on every Streamlit rerun is only
+    sent once, and concurrent requests for the same clip (submitted or async) share one upload. Failures return an
+    empty string and are not cached.
+    """
+
+    def __init__(self, url: str = TRANSCRIPTION_URL, timeout: float = TRANSCRIPTION_TIMEOUT,
+                 cache_size: int = TRANSCRIPTION_CACHE_SIZE):
+        self.url = url
+        self.timeout = httpx.Timeout(timeout, connect=TRANSCRIPTION_CONNECT_TIMEOUT)
+        self.cache_size = cache_size
+
+        self._client = None
+        self._async_client = None
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self._submitted = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+        # Counters exposed through stats()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.requests = 0
+        self.total_seconds = 0.0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.Client(timeout=self.timeout, headers={'Accept': 'application/json'})
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout, headers={'Accept': 'application/json'})
+        return self._async_client
+
+    @staticmethod
+    def content_hash(audio: bytes):
+        return hashlib.sha256(audio).hexdigest()
+
+    # --- Cache -----------------------------------------------------------------------------------------------------
+
+    def _cached(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+            return None
+
+    def _store(self, key, transcript):
+        if not transcript:
+            return
+        with self._lock:
+            self._cache[key] = transcript
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # --- Requests --------------------------------------------------------------------------------------------------
+
+    def _files(self, audio, filename):
+        return {'audio_file': (filename, audio, 'audio/mpeg')}
+
+    def _parse(self, response, elapsed):
+        self.requests += 1
+        self.total_seconds += elapsed
+        if response.status_code != 200:
+            self.errors += 1
+            logger.warning(f'Transcription server returned HTTP {response.status_code}.')
+            return ''
+        return _format_transcript(response.json())
+
+    def transcribe(self, audio: bytes, filename: str = 'query_audio.wav'):
+        """Transcribe a clip, blocking until the server replies or the timeout lapses"""
+        if not audio:
+            return 'No audio.'
+
+        key = self.content_hash(audio)
+        if (transcript := self._cached(key)) is not None:
+            return transcript
+
+        try:
+            response = self.client.post(self.url, files=self._files(audio, filename))
+            transcript = self._parse(response, response.elapsed.total_seconds())
+        except (httpx.HTTPError, ValueError) as e:
+            self.errors += 1
+            logger.warning(f'Transcription request failed: {type(e).__name__}: {e}')
+            return ''
+
+        self._store(key, transcript)
+        return transcript
+
+    def submit(self, audio: bytes, filename: str = 'query_audio.wav'):
+        """Transcribe a clip in a worker thread, returning a concurrent.futures.Future of the transcript"""
+        key = self.content_hash(audio)
+        with self._lock:
+            future = self._submitted.get(key)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(TRANSCRIPTION_WORKERS, thread_name_prefix='transcription')
+                future = self._executor.submit(self.transcribe, audio, filename)
+                self._submitted[key] = future
+                future.add_done_callback(lambda _: self._submitted.pop(key, None))
+        return future
+
+    async def atranscribe(self, audio: bytes, filename: str = 'query_audio.wav'):
+        """Transcribe a clip without blocking the event loop"""
+        if not audio:
+            return 'No audio.'
+
+        key = self.content_hash(audio)
+        if (transcript := self._cached(key)) is not None:
+            return transcript
+
+        # Concurrent requests for the same clip wait on the first upload
+        if key in self._in_flight:
+            return await asyncio.shield(self._in_flight[key])
+
+        task = asyncio.ensure_future(self._atranscribe(key, audio, filename))
+        self._in_flight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if self._in_flight.get(key) is task:
+                del self._in_flight[key]
+
+    async def _atranscribe(self, key, audio, filename):
+        try:
+            response = await self.async_client.post(self.url, files=self._files(audio, filename))
+            transcript = self._parse(response, response.elapsed.total_seconds())
+        except (httpx.HTTPError, ValueError) as e:
+            self.errors += 1
+            logger.warning(f'Transcription request failed: {type(e).__name__}: {e}')
+            return ''
+
+        self._store(key, transcript)
+        return transcript
+
+    def stats(self):
+        return {
+            'size': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'average_seconds': self.total_seconds / self.requests if self.requests else 0.0,
+        }
+
+    def close(self):
+        """Close pooled connections and worker threads, coroutines should use aclose()"""
+        if self._async_client is not None:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                asyncio.run(self._async_client.aclose())
+                self._async_client = None
+            else:
+                logger.warning('TranscriptionClient.close() called from a running event loop, use aclose().')
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.close()
+
+
+# Shared by every caller in this process
+transcription_client = TranscriptionClient()
@@ -0,0 +1,72 @@
+"""
+Local stand-in for the speech-to-text server, for running the front-ends and exercising the transcription client
+without the GPU host. It accepts the same multipart POST /generate upload and answers with a fixed transcript after an
+optional delay. Point the client at it with TRANSCRIPTION_URL:
+
+    python transcription_stub_server.py --port 8082 --delay 1.5
+    TRANSCRIPTION_URL=http://localhost:8082/generate streamlit run home.py
+"""
+import argparse
+import hashlib
+import json
+import logging
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionStubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, one handler instance serves every request on a connection, see `connections`
+    protocol_version = 'HTTP/1.1'
+    transcript = 'How do I treat a minor burn?'
+    delay = 0.0
+    requests = 0
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self):
+        if self.path != '/generate':
+            self.send_error(404)
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        type(self).requests += 1
+        time.sleep(self.delay)
+
+        payload = json.dumps({
+            'transcription': self.transcript,
+            'received_bytes': len(body),
+            'sha256': hashlib.sha256(body).hexdigest(),
+            'request': self.requests,
+        }).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.info(f'{self.address_string()} - {format % args}')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Stand-in speech-to-text server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before answering')
+    parser.add_argument('--transcript', default=TranscriptionStubHandler.transcript)
+    args = parser.parse_args()
+
+    TranscriptionStubHandler.transcript = args.transcript
+    TranscriptionStubHandler.delay = args.delay
+
+    server = ThreadingHTTPServer((args.host, args.port), TranscriptionStubHandler)
+    logger.info(f'Transcription stub listening on http://{args.host}:{args.port}/generate')
+    server.serve_forever()
@@ -1,7 +1,6 @@
-import json
+import asyncio
 import os
-import requests
-import shutil
+from transcription import transcription_client
 
 
 # Read AOSS config
@@ -15,42 +14,19 @@ def read_aoss_config(file_path, key):
     return None
 
 
-# Wipe directory of all contents
-def empty_directory(directory_path):
-    if not os.path.exists(directory_path):
-        return
+# Get text from speech, cached by audio content and sent over a pooled connection with timeouts
+def get_transcription(audio_filename):
+    with open(audio_filename, 'rb') as audio_file:
+        audio = audio_file.read()
 
-    for item in os.scandir(directory_path):
-        if item.is_file():
-            os.remove(item.path)
-        elif item.is_dir():
-            shutil.rmtree(item.path)
+    return transcription_client.transcribe(audio, os.path.basename(audio_filename))
 
 
-# Get text from speech
-def get_transcription(audio_filename):
-    file_size = os.path.getsize(audio_filename)
-    if file_size == 0:
-        return 'No audio.'
-
-    # Set the API endpoint
-    url = 'http://video.cavatar.info:8082/generate'
-
-    # Define HTTP headers
-    headers = {
-        'Accept': 'application/json',
-    }
-
-    # Define the file to be uploaded
-    files = {
-        'audio_file': (audio_filename, open(audio_filename, 'rb'), 'audio/mpeg')
-    }
-
-    # Make the POST request
-    response = requests.post(url, headers=headers, files=files)
-
-    if response.status_code == 200:
-        output = json.dumps(response.json(), indent=3).replace('"', '')
-        return output
-    else:
-        return ""
+# Get text from speech without blocking the event loop
+async def get_transcription_async(audio_filename):
+    def read():
+        with open(audio_filename, 'rb') as audio_file:
+            return audio_file.read()
+
+    audio = await asyncio.to_thread(read)
+    return await transcription_client.atranscribe(audio, os.path.basename(audio_filename))